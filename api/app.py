@@ -1,17 +1,19 @@
 # Modified:    2022-06-02
 # Description: Defines the FastAPI app
 #
+import os
 from pathlib import Path
 from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from controllers import game_controller, player_controller
+from controllers.responses import CustomJSONResponse
 from db import db
 from config import settings
 
-# create the app
-app = FastAPI()
+# create the app; responses are rendered with orjson unless an endpoint specifies otherwise
+app = FastAPI(default_response_class=CustomJSONResponse)
 
 # attach CORS middleware; current settings are only appropriate for development environments
 origins = [
@@ -47,7 +49,22 @@ if settings.STATIC_CONTENT_SRV and Path(settings.STATIC_CONTENT_DIR).is_dir():
 @app.on_event("startup")
 async def open_mongodb_connection():
     print("Connecting to MongoDB client...")
-    db.client = AsyncIOMotorClient(settings.MONGODB_URI)
+    # each worker process opens its own client, so the pool is sized per worker; the process id is included in the
+    # app name so that each worker's connections can be told apart on the server
+    timeouts = {
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+    }
+    db.client = AsyncIOMotorClient(
+        settings.MONGODB_URI,
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+        compressors=settings.MONGODB_COMPRESSORS,
+        retryWrites=True,
+        appname=f"{settings.APP_NAME}-{os.getpid()}",
+        # only override the driver's default timeouts if they've been configured
+        **{option: value for option, value in timeouts.items() if value is not None},
+    )
     await db.index()  # index the db for faster lookups and to enforce uniqueness
     print("Connection successful" if db.client else "Connection failed")
 
@@ -1,6 +1,7 @@
 # Modified:    2022-06-02
 # Description: Loads settings from environment
 
+from typing import Optional
 from pydantic import BaseSettings
 
 
@@ -13,6 +14,15 @@ class _Settings(BaseSettings):
     HOST: str
     PORT: int
     MONGODB_URI: str
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 5
+    # the timeouts are left to the driver's defaults (30 seconds to select a server, waiting indefinitely for a pooled
+    # connection) unless they're set, since short timeouts turn brief failovers and load spikes into bursts of errors
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: Optional[int] = None
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
+    MONGODB_COMPRESSORS: str = "zlib"
+    # how long each worker caches player documents, in seconds; 0 disables the cache (see player_model)
+    PLAYER_CACHE_TTL: float = 10
     DB_NAME: str
     PLAYER_COLLECTION_NAME: str
     GAME_COLLECTION_NAME: str
@@ -17,6 +17,13 @@ SKIP_DESC: Final = "An offset, used to page through the results." \
                    "For example, if a previous call was made with a skip of 0 and a limit of 20, a subsequent call " \
                    "to obtain the next page of results should have a skip of 20"
 LIMIT_DESC: Final = "Maximum number of documents to include"
+AFTER_ID_DESC: Final = "The ID of the last document in the previous page, used to page through the results more " \
+                       "efficiently than skip. If this is passed, only documents following it are included, and skip " \
+                       "should be 0"
+
+# the maximum number of documents in a page of results; a page of games is joined onto the player's document before it's
+# returned (see game_model.find_by_player_id), so it must stay well under MongoDB's 16 MB document limit
+MAX_PAGE_SIZE: Final = 100
 
 # standard ID representing the AI player
 AI_PLAYER_ID: Final = "AI_PLAYER"
@@ -2,7 +2,8 @@
 # Description: Implements a controller for /game
 #
 from typing import Union
-from fastapi import APIRouter, Path, HTTPException, status
+from bson import ObjectId
+from fastapi import APIRouter, Depends, Path, HTTPException, status
 from models import game_model, player_model, move_model
 from marble_game import make_move_ai
 from .responses import CustomJSONResponse as JSONResponse
@@ -13,9 +14,23 @@ router = APIRouter()
 
 # define constants for error messages
 INVALID_PARAMS_MESSAGE = "Invalid parameters: player ids must be valid and unique, colors must be 'B' or 'W' and unique"
+INTERNAL_SERVER_ERROR_MESSAGE = "Internal server error"
+AI_MOVE_FAILED_MESSAGE = "Internal server error: AI move failed"
+GAME_UPDATE_FAILED_MESSAGE = "Internal server error: game update failed."
 
 
-@router.post("/", response_description="Create a new game", response_model=game_model.GameModel)
+def parse_game_id(game_id: str = Path(..., regex=ID_REGEX, description=GAME_ID_DESC)) -> ObjectId:
+    """Converts the game id path parameter to an ObjectId once, so the models can use it as-is"""
+    return ObjectId(game_id)    # the regex guarantees this is a valid ObjectId
+
+
+@router.post(
+    "/",
+    response_description="Create a new game",
+    status_code=status.HTTP_201_CREATED,
+    response_model=None,
+    responses={status.HTTP_201_CREATED: {"model": game_model.GameModel}},
+)
 async def create_game(
         # more restrictive schema must be first (see https://fastapi.tiangolo.com/tutorial/extra-models/#union-or-anyof)
         game_input: Union[game_model.TwoPlayerGameInput, game_model.OnePlayerGameInput]
@@ -27,10 +42,10 @@ async def create_game(
     """
     versus_ai = isinstance(game_input, game_model.OnePlayerGameInput)
 
-    # generate default values for AI (if applicable) and ignore case
+    # generate default values for AI (if applicable); colors have already been normalized to uppercase
     p1_id = game_input.player_one_id
     p2_id = game_input.player_two_id if not versus_ai else AI_PLAYER_ID
-    p1_color = game_input.player_one_color.upper()
+    p1_color = game_input.player_one_color
     p2_color = game_input.player_two_color if not versus_ai else ('W' if p1_color == 'B' else 'B')
 
     # validate input for one player games (vs AI)
@@ -52,26 +67,34 @@ async def create_game(
 
     # create the game
     if (created := await game_model.create((p1_id, p1_color), (p2_id, p2_color), versus_ai)) is None:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=INTERNAL_SERVER_ERROR_MESSAGE)
 
     # update the player resources (if applicable)
-    await player_model.add_current_game(p1_id, created["_id"])
-    if not versus_ai:
-        await player_model.add_current_game(p2_id, created["_id"])
+    await player_model.bulk_add_current_game([p1_id] if versus_ai else [p1_id, p2_id], created["_id"])
 
     return JSONResponse(status_code=status.HTTP_201_CREATED, content=created)
 
 
-@router.get("/{game_id}", response_description="Get a game", response_model=game_model.GameModel)
-async def retrieve_game(game_id: str = Path(..., regex=ID_REGEX, description=GAME_ID_DESC)) -> JSONResponse:
+@router.get(
+    "/{game_id}",
+    response_description="Get a game",
+    response_model=None,
+    responses={status.HTTP_200_OK: {"model": game_model.GameModel}},
+)
+async def retrieve_game(game_id: ObjectId = Depends(parse_game_id)) -> JSONResponse:
     """Handles /game/{game_id} retrieve requests."""
     if (retrieved := await game_model.find(game_id)) is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Game with id={game_id} not found")
     return JSONResponse(status_code=status.HTTP_200_OK, content=retrieved)
 
 
-@router.patch("/{game_id}/make-move", response_description="Make a move", response_model=move_model.MoveOutput)
-async def make_move(game_id: str, move: move_model.MoveInput) -> JSONResponse:
+@router.patch(
+    "/{game_id}/make-move",
+    response_description="Make a move",
+    response_model=None,
+    responses={status.HTTP_200_OK: {"model": move_model.MoveOutput}},
+)
+async def make_move(move: move_model.MoveInput, game_id: ObjectId = Depends(parse_game_id)) -> JSONResponse:
     """
     Handles /game/{game_id}/move update requests.
 
@@ -88,28 +111,19 @@ async def make_move(game_id: str, move: move_model.MoveInput) -> JSONResponse:
     move_successful = game.make_move(move.player_id, (move.row_coord, move.col_coord), move.direction.upper())
     if move_successful and versus_ai and game.winner is None:       # make the AI player's move
         if not make_move_ai(AI_PLAYER_ID, game):                    # this move should always succeed
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Internal server error: AI move failed"
-            )
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=AI_MOVE_FAILED_MESSAGE)
 
     # update game resource
-    if await game_model.update_game_state(game_id, game) is None:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error: game update failed."
-        )
+    if await game_model.update_game_state(game_id, game) == 0:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=GAME_UPDATE_FAILED_MESSAGE)
 
     # check if the game is over
     game_complete = game.winner is not None
 
     # update player resources, if applicable (and only the *first time* there's a winner)
     if move_successful and game_complete:
-        if versus_ai:
-            await player_model.move_current_game_to_completed(move.player_id, game_id)
-        else:
-            for player_id in game.player_ids:
-                await player_model.move_current_game_to_completed(player_id, game_id)
+        player_ids = [move.player_id] if versus_ai else list(game.player_ids)
+        await player_model.bulk_move_current_game_to_completed(player_ids, game_id)
 
     res = {
         "move_successful": move_successful,
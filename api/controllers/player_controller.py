@@ -1,29 +1,67 @@
 # Modified:    2021-08-30
 # Description: Implements a controller for /player
 #
-from fastapi import APIRouter, Path, HTTPException, status, Query
+import msgspec
+from typing import Optional
+from fastapi import APIRouter, Depends, Path, HTTPException, Request, status, Query
+from fastapi.responses import StreamingResponse
+from pymongo.errors import DuplicateKeyError
 from models import player_model, game_model
 from .responses import CustomJSONResponse as JSONResponse
-from . import ID_REGEX, PLAYER_ID_DESC, SKIP_DESC, LIMIT_DESC
+from .streaming import json_array_response
+from . import ID_REGEX, PLAYER_ID_DESC, SKIP_DESC, LIMIT_DESC, AFTER_ID_DESC, MAX_PAGE_SIZE
 
 router = APIRouter()
 
+# define constants for error messages
+INTERNAL_SERVER_ERROR_MESSAGE = "Internal server error"
 
-@router.post("/", response_description="Create a new player", response_model=player_model.PlayerModel)
-async def create_player(player_input: player_model.PlayerInput) -> JSONResponse:
+# request bodies are decoded by msgspec, so the decoder can be reused
+_player_input_decoder = msgspec.json.Decoder(player_model.PlayerInput)
+
+
+async def parse_player_input(request: Request) -> player_model.PlayerInput:
+    """Decodes and validates the request body as PlayerInput"""
+    try:
+        return _player_input_decoder.decode(await request.body())
+    except msgspec.DecodeError as e:    # also raised when the body is valid JSON but fails validation
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+
+@router.post(
+    "/",
+    response_description="Create a new player",
+    status_code=status.HTTP_201_CREATED,
+    response_model=None,
+    responses={status.HTTP_201_CREATED: {"model": player_model.PlayerModel}},
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": player_model.PlayerInputSchema.schema()}},
+            "required": True,
+        },
+    },
+)
+async def create_player(player_input: player_model.PlayerInput = Depends(parse_player_input)) -> JSONResponse:
     """Handles /player create requests."""
-    # ensure auth0_id is unique
-    if await player_model.find_by_auth0_id(player_input.auth0_id) is not None:
+    # auth0_id is uniquely indexed, so the database rejects duplicates for us
+    try:
+        created = await player_model.create(player_input)
+    except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"User with auth0_id={player_input.auth0_id} already exists"
         )
-    if (created := await player_model.create(player_input)) is None:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+    if created is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=INTERNAL_SERVER_ERROR_MESSAGE)
     return JSONResponse(status_code=status.HTTP_201_CREATED, content=created)
 
 
-@router.get("/{player_id}", response_description="Get a player", response_model=player_model.PlayerModel)
+@router.get(
+    "/{player_id}",
+    response_description="Get a player",
+    response_model=None,
+    responses={status.HTTP_200_OK: {"model": player_model.PlayerModel}},
+)
 async def retrieve_player(
         player_id: str = Path(..., regex=ID_REGEX, description=PLAYER_ID_DESC),
 ) -> JSONResponse:
@@ -36,54 +74,60 @@ async def retrieve_player(
 @router.get(
     "/{player_id}/games",
     response_description="Get all of a player's games (both current and completed)",
-    response_model=game_model.GameModelArray
+    response_model=None,
+    responses={status.HTTP_200_OK: {"model": game_model.GameSummaryModelArray}},
 )
 async def retrieve_player_games(
         player_id: str = Path(..., regex=ID_REGEX, description=PLAYER_ID_DESC),
         skip: int = Query(..., ge=0, description=SKIP_DESC),
-        limit: int = Query(..., gt=0, le=100, description=LIMIT_DESC),
-) -> JSONResponse:
+        limit: int = Query(..., gt=0, le=MAX_PAGE_SIZE, description=LIMIT_DESC),
+        after_id: Optional[str] = Query(None, regex=ID_REGEX, description=AFTER_ID_DESC),
+) -> StreamingResponse:
     """Handles /player/{player_id}/games retrieve requests."""
-    # find_by_player_id should always return an array (barring database connection issues); if the array is empty, we
-    # need to check whether the player exists so that we can return a specific error (otherwise, the empty array)
-    if (retrieved := await game_model.find_by_player_id(player_id, skip, limit)) is None:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
-    if not retrieved and await(player_model.find_by_id(player_id)) is None:
+    # find_by_player_id also reports whether the player exists, so that we can return a specific error (otherwise, the
+    # possibly empty array) without making a second query
+    if (retrieved := await game_model.find_by_player_id(
+            player_id, skip, limit, after_id=after_id, projection=game_model.SUMMARY_PROJECTION
+    )) is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id={player_id} not found")
-    return JSONResponse(status_code=status.HTTP_200_OK, content=retrieved)
+    return await json_array_response(retrieved)
 
 
 @router.get(
     "/{player_id}/games/current",
     response_description="Get a player's current games",
-    response_model=game_model.GameModelArray
+    response_model=None,
+    responses={status.HTTP_200_OK: {"model": game_model.GameSummaryModelArray}},
 )
 async def retrieve_player_games_current(
         player_id: str = Path(..., regex=ID_REGEX, description=PLAYER_ID_DESC),
         skip: int = Query(..., ge=0, description=SKIP_DESC),
-        limit: int = Query(..., ge=1, le=100, description=LIMIT_DESC),
-) -> JSONResponse:
+        limit: int = Query(..., ge=1, le=MAX_PAGE_SIZE, description=LIMIT_DESC),
+        after_id: Optional[str] = Query(None, regex=ID_REGEX, description=AFTER_ID_DESC),
+) -> StreamingResponse:
     """Handles /player/{player_id}/games/current retrieve requests."""
-    if (retrieved := await game_model.find_by_player_id(player_id, skip, limit, {"completed": False})) is None:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
-    if not retrieved and await(player_model.find_by_id(player_id)) is None:
+    if (retrieved := await game_model.find_by_player_id(
+            player_id, skip, limit, {"completed": False}, after_id=after_id, projection=game_model.SUMMARY_PROJECTION
+    )) is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id={player_id} not found")
-    return JSONResponse(status_code=status.HTTP_200_OK, content=retrieved)
+    return await json_array_response(retrieved)
 
 
 @router.get(
     "/{player_id}/games/completed",
     response_description="Get a player's completed games",
-    response_model=game_model.GameModelArray
+    response_model=None,
+    responses={status.HTTP_200_OK: {"model": game_model.GameSummaryModelArray}},
 )
 async def retrieve_player_games_completed(
         player_id: str = Path(..., regex=ID_REGEX, description=PLAYER_ID_DESC),
         skip: int = Query(..., ge=0, description=SKIP_DESC),
-        limit: int = Query(..., ge=1, le=100, description=LIMIT_DESC),
-) -> JSONResponse:
+        limit: int = Query(..., ge=1, le=MAX_PAGE_SIZE, description=LIMIT_DESC),
+        after_id: Optional[str] = Query(None, regex=ID_REGEX, description=AFTER_ID_DESC),
+) -> StreamingResponse:
     """Handles /player/{player_id}/games/current retrieve requests."""
-    if (retrieved := await game_model.find_by_player_id(player_id, skip, limit, {"completed": True})) is None:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
-    if not retrieved and await(player_model.find_by_id(player_id)) is None:
+    if (retrieved := await game_model.find_by_player_id(
+            player_id, skip, limit, {"completed": True}, after_id=after_id, projection=game_model.SUMMARY_PROJECTION
+    )) is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id={player_id} not found")
-    return JSONResponse(status_code=status.HTTP_200_OK, content=retrieved)
+    return await json_array_response(retrieved)
@@ -1,41 +1,28 @@
 # Modified:    2021-08-26
 # Description: Define custom JSON encoder for JSON responses
 #
-import json
+import orjson
 from bson import ObjectId
-from typing import Any
+from typing import Any, Union
 from fastapi.responses import JSONResponse
-from marble_game import MarbleGame, MarbleGameEncoder
-from models.pydantic_object_id import PydanticObjectID
+from marble_game import MarbleGame
+
+
+def encode_default(o: Any) -> Union[str, dict]:
+    """Encodes the objects orjson can't serialize natively; pass this to orjson.dumps as default"""
+    # ObjectId -> str (this includes PydanticObjectID)
+    if isinstance(o, ObjectId):
+        return str(o)
+    # MarbleGame -> dict (which orjson then serializes natively, rather than embedding a JSON string)
+    if isinstance(o, MarbleGame):
+        return o.to_dict()
+    raise TypeError(f"Unsupported type {o.__class__}")
 
 
 class CustomJSONResponse(JSONResponse):
     """Extends JSONResponse so that custom objects are encoded correctly"""
 
-    # override the default json encoder
+    # override the default json encoder; orjson only calls encode_default for the objects it can't serialize, so the
+    # content doesn't need to be walked (or copied) beforehand
     def render(self, content: Any) -> bytes:
-        # generally, FastAPI will call dict() on the pydantic model
-        if isinstance(content, dict):
-            for k, v in content.items():
-                # ObjectId -> str
-                if isinstance(v, (ObjectId, PydanticObjectID)):
-                    content[k] = str(v)
-                # MarbleGame -> dict
-                elif isinstance(v, MarbleGame):
-                    content[k] = json.dumps(v, cls=MarbleGameEncoder)
-        elif isinstance(content, list):
-            for d in content:
-                for k, v in d.items():
-                    # ObjectId -> str
-                    if isinstance(v, (ObjectId, PydanticObjectID)):
-                        d[k] = str(v)
-                    # MarbleGame -> dict
-                    elif isinstance(v, MarbleGame):
-                        d[k] = json.dumps(v, cls=MarbleGameEncoder)
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-        ).encode("utf-8")
+        return orjson.dumps(content, default=encode_default)
@@ -0,0 +1,45 @@
+# Modified:    2022-06-02
+# Description: Defines helpers for streaming JSON responses
+#
+import orjson
+from typing import AsyncIterator, Optional
+from fastapi import status
+from fastapi.responses import StreamingResponse
+from .responses import encode_default
+
+
+async def json_array_response(
+        documents: AsyncIterator[dict], status_code: int = status.HTTP_200_OK
+) -> StreamingResponse:
+    """
+    Returns a response that streams the documents to the client as a JSON array.
+
+    The first document is retrieved before the response is started, so that an error retrieving it is raised here (and
+    reported as a 500) rather than truncating a response that has already been sent with a success status; iterators
+    that may fail after their first document (e.g. a cursor that needs more than one batch) shouldn't be streamed.
+
+    :param documents: an async iterator over the documents to encode (e.g. the result of game_model.find_by_player_id)
+    :param status_code: the status code of the response
+    """
+    first = await anext(documents, None)
+    return StreamingResponse(
+        stream_json_array(first, documents),
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+async def stream_json_array(first: Optional[dict], documents: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """
+    Encodes the documents as a JSON array, one document at a time.
+
+    :param first: the first document, already retrieved from documents (or None if there are no documents)
+    :param documents: an async iterator over the remaining documents to encode
+    """
+    if first is None:
+        yield b"[]"
+        return
+    yield b"[" + orjson.dumps(first, default=encode_default)
+    async for document in documents:
+        yield b"," + orjson.dumps(document, default=encode_default)
+    yield b"]"
@@ -2,28 +2,51 @@
 # Description: Defines the database for the app
 #
 import pymongo
+from pymongo.write_concern import WriteConcern
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 from config import settings
 
 
 class _MongoDBClient:
     """Wraps AsyncIOMotorClient so that database connection can be shared among modules"""
-    client: AsyncIOMotorClient = None
+    _client: AsyncIOMotorClient = None
 
-    async def get_player_collection(self) -> AsyncIOMotorCollection:
-        return self.client[settings.DB_NAME][settings.PLAYER_COLLECTION_NAME]
+    # collection handles are bound once, when the client is set, rather than looked up for every operation
+    player_collection: AsyncIOMotorCollection = None
+    game_collection: AsyncIOMotorCollection = None
+    # game states are written on every move, so those writes are acknowledged by the primary without waiting for the
+    # journal; a server crash can lose the most recent moves, but not the games or players themselves
+    game_state_collection: AsyncIOMotorCollection = None
 
-    async def get_game_collection(self) -> AsyncIOMotorCollection:
-        return self.client[settings.DB_NAME][settings.GAME_COLLECTION_NAME]
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        """The client; setting it also binds the collections"""
+        return self._client
+
+    @client.setter
+    def client(self, client: AsyncIOMotorClient):
+        self._client = client
+        self.player_collection = client[settings.DB_NAME][settings.PLAYER_COLLECTION_NAME]
+        self.game_collection = client[settings.DB_NAME][settings.GAME_COLLECTION_NAME]
+        self.game_state_collection = self.game_collection.with_options(write_concern=WriteConcern(w=1, j=False))
 
     async def index(self) -> None:
         """Indexes the database's collections; should be run once on app startup"""
-        # index the user collection by id and auth0_id
-        player_collection = await self.get_player_collection()
-        await player_collection.create_index(
-            [("_id", pymongo.ASCENDING), ("auth0_id", pymongo.ASCENDING)],
+        # index the user collection by auth0_id (_id is indexed automatically); this also enforces its uniqueness
+        await self.player_collection.create_index(
+            [("auth0_id", pymongo.ASCENDING)],
             unique=True,
         )
+        # index the game collection by player, completion and id so that a player's games can be filtered and paged
+        # through without scanning the collection
+        await self.game_collection.create_index(
+            [("player_ids", pymongo.ASCENDING), ("completed", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+        )
+        # that index only provides games in id order when completed is also matched, so listing all of a player's games
+        # needs its own index to be paged through without sorting them in memory
+        await self.game_collection.create_index(
+            [("player_ids", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+        )
 
 
 db = _MongoDBClient()
@@ -1,14 +1,15 @@
 # Modified:    2022-06-01
 # Description: Implements a model for game info
 #
-import json
-from typing import Optional
-from pydantic import BaseModel, Field
-from pymongo import ReturnDocument, CursorType
-from marble_game import MarbleGame, MarbleGameEncoder, MarbleGameDecoder
+import orjson
+from bson import ObjectId
+from typing import AsyncIterator, Final, Optional, Union
+from pydantic import BaseModel, Field, validator
+from marble_game import MarbleGame
 from db import db
+from config import settings
 from .pydantic_object_id import PydanticObjectID
-from . import OBJ_ID_FIELD_DESC, COLOR_REGEX, ID_REGEX, PLAYER_ID_DESC, COLOR_FIELD_DESC
+from . import OBJ_ID_FIELD_DESC, COLOR_REGEX, ID_REGEX, PLAYER_ID_DESC, COLOR_FIELD_DESC, MAX_PAGE_SIZE
 
 
 class MarbleGameModel(BaseModel):
@@ -94,10 +95,56 @@ class GameModelArray(BaseModel):
     __root__: list[GameModel] = Field(..., description="Array of game id (key) - game data (value) pairs")
 
 
+class MarbleGameSummaryModel(BaseModel):
+    """Defines the MarbleGame schema without the board, as returned when listing games (see SUMMARY_PROJECTION)"""
+    players: dict = Field(..., description="A representation of the players' states")
+    current_turn: Optional[str] = Field(..., description="The current player's ID, if any")
+    winner: Optional[str] = Field(..., description="The winning player's ID, if any")
+
+    class Config:
+        # define JSON metadata for FastAPI's doc generator
+        schema_extra = {
+            "example": {
+                key: value for key, value in MarbleGameModel.Config.schema_extra["example"].items() if key != "board"
+            }
+        }
+
+
+class GameSummaryModel(GameModel):
+    """Defines the Game schema without the board, as returned when listing games (see SUMMARY_PROJECTION)"""
+    game_state: MarbleGameSummaryModel = Field(..., description="A representation of the game state, without the board")
+
+    class Config:
+        # define JSON metadata for FastAPI's doc generator
+        schema_extra = {
+            "example": {
+                **GameModel.Config.schema_extra["example"],
+                "game_state": MarbleGameSummaryModel.Config.schema_extra["example"],
+            }
+        }
+
+
+class GameSummaryModelArray(BaseModel):
+    """Defines the output schema for arrays of GameSummaryModels"""
+    __root__: list[GameSummaryModel] = Field(..., description="Array of game id (key) - game data (value) pairs")
+
+
+def _normalize_color(color: str) -> str:
+    """
+    Validates a marble color and normalizes it to uppercase. This replaces matching COLOR_REGEX, which is only passed to
+    the color fields (as pattern) so that it's still documented.
+    """
+    if (color := color.upper()) not in {'B', 'W'}:
+        raise ValueError("color must be 'B' or 'W' (case-insensitive)")
+    return color
+
+
 class _BaseGameInput(BaseModel):
     """Defines the base input schema for Game data"""
     player_one_id: str = Field(..., regex=ID_REGEX, description=f"{PLAYER_ID_DESC}: {OBJ_ID_FIELD_DESC}")
-    player_one_color: str = Field(..., regex=COLOR_REGEX, description=COLOR_FIELD_DESC)
+    player_one_color: str = Field(..., pattern=COLOR_REGEX, description=COLOR_FIELD_DESC)
+
+    _normalize_player_one_color = validator("player_one_color", allow_reuse=True)(_normalize_color)
 
 
 class OnePlayerGameInput(_BaseGameInput):
@@ -116,7 +163,9 @@ class OnePlayerGameInput(_BaseGameInput):
 class TwoPlayerGameInput(_BaseGameInput):
     """Defines the input schema for a two-player (player vs. player) game"""
     player_two_id: str = Field(..., regex=ID_REGEX, description=f"{PLAYER_ID_DESC}: {OBJ_ID_FIELD_DESC}")
-    player_two_color: str = Field(..., regex=COLOR_REGEX, description=COLOR_FIELD_DESC)
+    player_two_color: str = Field(..., pattern=COLOR_REGEX, description=COLOR_FIELD_DESC)
+
+    _normalize_player_two_color = validator("player_two_color", allow_reuse=True)(_normalize_color)
 
     class Config:
         # define JSON metadata for FastAPI's doc generator
@@ -130,6 +179,24 @@ class TwoPlayerGameInput(_BaseGameInput):
         }
 
 
+# ---- SERIALIZATION ----
+# game states are stored as subdocuments (see MarbleGame.to_dict); games created before that change store them in the
+# format MarbleGameEncoder used to produce instead (a JSON object whose board and players are themselves JSON-encoded)
+def _decode_game_state(game_state: Union[dict, str]) -> MarbleGame:
+    """Restores a MarbleGame from a stored game state"""
+    if isinstance(game_state, dict):
+        return MarbleGame.from_dict(game_state)
+    game_dict = orjson.loads(game_state)
+    game_dict["board"] = orjson.loads(game_dict["board"])
+    game_dict["players"] = orjson.loads(game_dict["players"])
+    return MarbleGame.from_dict(game_dict)
+
+
+# ---- PROJECTIONS ----
+# listing a player's games doesn't require the board, which makes up most of each game document
+SUMMARY_PROJECTION: Final = {"game_state.board": 0}
+
+
 # ---- CREATE ----
 async def create(player_one_data: tuple[str, str], player_two_data: tuple[str, str], versus_ai: bool) -> dict:
     """
@@ -140,70 +207,127 @@ async def create(player_one_data: tuple[str, str], player_two_data: tuple[str, s
     :param versus_ai: True if the game is one-player (vs AI), False if the game is two-player (vs player)
     :return: an awaitable resolving to the inserted document
     """
-    collection = await db.get_game_collection()
+    collection = db.game_collection
     player_ids = [player_one_data[0], player_two_data[0]]
-    game_state = json.dumps(
-        MarbleGame(player_one_data, player_two_data),
-        cls=MarbleGameEncoder,
-    )
-    res = await collection.insert_one({
+    game_state = MarbleGame(player_one_data, player_two_data).to_dict()
+    game = {
         "player_ids": player_ids,
         "game_state": game_state,
         "versus_ai": versus_ai,
         "completed": False,
-    })
-    return await find(res.inserted_id)
+    }
+    res = await collection.insert_one(game)
+    # the inserted document is already known, so there's no need to retrieve it
+    game["_id"] = res.inserted_id
+    return game
 
 
 # ---- RETRIEVE ----
-async def find(game_id: str) -> Optional[dict]:
+async def find(game_id: ObjectId) -> Optional[dict]:
     """
     Retrieves the specified game document.
 
     :param game_id: the object id of the game
     :return: an awaitable resolving to the matching document, or None if one is not found
     """
-    collection = await db.get_game_collection()
-    return await collection.find_one({"_id": PydanticObjectID(game_id)})
-
-
-async def find_by_player_id(player_id: str, skip: int = 0, limit: int = 20, additional_filters: dict = None) -> list:
+    collection = db.game_collection
+    return await collection.find_one({"_id": game_id})
+
+
+async def find_by_player_id(
+        player_id: str,
+        skip: int = 0,
+        limit: int = 20,
+        additional_filters: dict = None,
+        after_id: Optional[str] = None,
+        projection: Optional[dict] = None,
+) -> Optional[AsyncIterator[dict]]:
     """
-    Retrieves an array of game documents containing the specified player_id.
+    Retrieves the game documents containing the specified player_id. Whether the player exists is determined in the
+    same round trip, so callers can distinguish an unknown player from a player without any (matching) games.
+
+    The page of games is joined onto the player's document on the server, so limit is capped at MAX_PAGE_SIZE to keep
+    that document under MongoDB's 16 MB limit; the whole page is returned in the cursor's first batch, which is
+    retrieved before this returns, so iterating over the documents doesn't make any further round trips.
 
     :param player_id: the object id of the player
     :param skip: the number of documents to skip (use this for more efficient searches; should be set to
                  limit*num_previous_calls on subsequent calls)
-    :param limit: the maximum number of games to return (default = 20)
+    :param limit: the maximum number of games to return (default = 20, at most MAX_PAGE_SIZE)
     :param additional_filters: any additional filters, passed as key-value pairs
-    :return: an awaitable resolving to the array of matching document, or an empty array if there are none
+    :param after_id: if passed, only games whose object id follows this one are retrieved (games are ordered by id, so
+                     passing the id of the last game in the previous page retrieves the next page without skipping)
+    :param projection: if passed, the projection applied to each game document (e.g. SUMMARY_PROJECTION); otherwise,
+                       the full documents are retrieved
+    :return: an awaitable resolving to an async iterator over the matching documents (which may be exhausted
+             immediately if there are none), or None if the player does not exist
+    :raises ValueError: if limit is greater than MAX_PAGE_SIZE
     """
+    if limit > MAX_PAGE_SIZE:
+        raise ValueError(f"limit must not be greater than {MAX_PAGE_SIZE}")
     filters = {} if additional_filters is None else additional_filters
     filters.update({"player_ids": player_id})
-    collection = await db.get_game_collection()
-    cursor = collection.find(
-        filter=filters,
-        skip=skip,
-        limit=limit,
-        cursor_type=CursorType.NON_TAILABLE,
-    )
-    return await cursor.to_list(length=limit)
+    if after_id is not None:
+        filters.update({"_id": {"$gt": ObjectId(after_id)}})
+    # run the pipeline against the player collection: if the player doesn't exist, no document is returned; otherwise,
+    # the page of games is joined onto the player's document and unwound into one document per game (or a single empty
+    # document, if the player doesn't have any matching games)
+    game_pipeline = [
+        {"$match": filters},
+        {"$sort": {"_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
+    ]
+    if projection is not None:
+        game_pipeline.append({"$project": projection})
+    collection = db.player_collection
+    cursor = collection.aggregate([
+        {"$match": {"_id": ObjectId(player_id)}},
+        {"$lookup": {
+            "from": settings.GAME_COLLECTION_NAME,
+            "pipeline": game_pipeline,
+            "as": "games",
+        }},
+        {"$unwind": {"path": "$games", "preserveNullAndEmptyArrays": True}},
+        {"$replaceRoot": {"newRoot": {"$ifNull": ["$games", {}]}}},
+    ], batchSize=limit + 1)     # return the whole page in the first batch (a player without games yields one document)
+    if (first := await anext(cursor, None)) is None:
+        return None
+    return _iterate_games(first, cursor)
+
+
+async def _iterate_games(first: dict, cursor: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    """
+    Helper for find_by_player_id. Yields the first (already retrieved) game document, followed by the documents
+    remaining in the cursor.
+
+    :param first: the first document returned by the cursor; this is empty if there are no matching games
+    :param cursor: the cursor containing the remaining documents
+    """
+    if first:
+        yield first
+        async for game in cursor:
+            yield game
 
 
-async def find_and_decode_game_state(game_id: str) -> Optional[tuple[MarbleGame, bool]]:
+async def find_and_decode_game_state(game_id: ObjectId) -> Optional[tuple[MarbleGame, bool]]:
     """
     Retrieves the specified game document's game state and whether the game is versus_ai.
 
     :param game_id: the object id of the game
     :return: an awaitable resolving to the matching document's game_state, or None if one is not found
     """
-    collection = await db.get_game_collection()
-    if (game := await collection.find_one({"_id": PydanticObjectID(game_id)})) is not None:
-        return json.loads(game["game_state"], cls=MarbleGameDecoder), game["versus_ai"]
+    collection = db.game_collection
+    game = await collection.find_one(
+        {"_id": game_id},
+        projection={"_id": 0, "game_state": 1, "versus_ai": 1},    # only these are needed to restore the game
+    )
+    if game is not None:
+        return _decode_game_state(game["game_state"]), game["versus_ai"]
 
 
 # ---- UPDATE ----
-async def update_game_state(game_id: str, new_game_state: MarbleGame) -> Optional[dict]:
+async def update_game_state(game_id: ObjectId, new_game_state: MarbleGame) -> int:
     """
     Updates the specified game document as follows:
         * game_state is replaced with the value passed
@@ -211,45 +335,41 @@ async def update_game_state(game_id: str, new_game_state: MarbleGame) -> Optiona
 
     :param game_id: the object id of the game
     :param new_game_state: the new game state
-    :return: an awaitable resolving to the updated document, or None if one is not found
+    :return: an awaitable resolving to the number of matching documents
     """
-    collection = await db.get_game_collection()
-    values_to_set = {
-        "game_state": json.dumps(new_game_state, cls=MarbleGameEncoder),
-        "completed": new_game_state.winner is not None
-    }
-    updated_game = await collection.find_one_and_update(
-        {"_id": PydanticObjectID(game_id)},
-        {"$set": values_to_set},
-        return_document=ReturnDocument.AFTER,
+    collection = db.game_state_collection    # see db for the durability trade-off
+    # completed is derived from the stored game state by the server, so the two can't disagree; this needs a pipeline
+    # update, and the stages must be separate since each stage only sees the fields set by the previous ones
+    updated = await collection.update_one(
+        {"_id": game_id},
+        [
+            {"$set": {"game_state": {"$literal": new_game_state.to_dict()}}},
+            {"$set": {"completed": {"$ne": ["$game_state.winner", None]}}},
+        ],
     )
-    return updated_game
+    return updated.matched_count
 
 
-async def force_complete(game_id: str) -> Optional[dict]:
+async def force_complete(game_id: ObjectId) -> int:
     """
     Updates the specified game document by setting completed to True, regardless of whether there's a winner.
 
     :param game_id: the object id of the game
-    :return: an awaitable resolving to the updated document, or None if one is not found
+    :return: an awaitable resolving to the number of matching documents
     """
-    collection = await db.get_game_collection()
-    updated_game = await collection.find_one_and_update(
-        {"_id": PydanticObjectID(game_id)},
-        {"$set": {"completed": True}},
-        return_document=ReturnDocument.AFTER,
-    )
-    return updated_game
+    collection = db.game_collection
+    updated = await collection.update_one({"_id": game_id}, {"$set": {"completed": True}})
+    return updated.matched_count
 
 
 # ---- DELETE ----
-async def delete(game_id: str) -> int:
+async def delete(game_id: ObjectId) -> int:
     """
     Deletes the specified game from the database.
 
     :param game_id: the object id of the game
     :return: an awaitable resolving to the number of deleted documents
     """
-    collection = await db.get_game_collection()
-    deleted = await collection.delete_one({"_id": PydanticObjectID(game_id)})
+    collection = db.game_collection
+    deleted = await collection.delete_one({"_id": game_id})
     return deleted.deleted_count
@@ -1,10 +1,18 @@
 # Modified:    2021-08-26
 # Description: Implements a model for player info
 #
+import asyncio
+from collections import OrderedDict
+from contextlib import contextmanager
+from copy import deepcopy
+from time import monotonic
+import msgspec
+from bson import ObjectId
 from pydantic import BaseModel, Field
-from pymongo import ReturnDocument
-from typing import Optional
+from pymongo import ReturnDocument, UpdateOne
+from typing import Final, Iterator, Optional
 from db import db
+from config import settings
 from .pydantic_object_id import PydanticObjectID
 from . import OBJ_ID_FIELD_DESC
 
@@ -12,8 +20,8 @@ from . import OBJ_ID_FIELD_DESC
 class PlayerModel(BaseModel):
     """Defines the base player schema"""
     id: str = Field(default_factory=PydanticObjectID, alias="_id", description=OBJ_ID_FIELD_DESC)
-    current_games: list = Field(default_factory=lambda: [], description="A list of Game IDs denoting ongoing games")
-    completed_games: list = Field(default_factory=lambda: [], description="A list of Game IDs denoting completed games")
+    current_games: list = Field(default_factory=list, description="A list of Game IDs denoting ongoing games")
+    completed_games: list = Field(default_factory=list, description="A list of Game IDs denoting completed games")
 
     class Config:
         # allow id to be populated by id or _id
@@ -29,8 +37,13 @@ class PlayerModel(BaseModel):
         }
 
 
-class PlayerInput(BaseModel):
-    """Defines the player input schema"""
+class PlayerInput(msgspec.Struct):
+    """Defines the player input schema; decoded with msgspec, see PlayerInputSchema for its documentation"""
+    auth0_id: str
+
+
+class PlayerInputSchema(BaseModel):
+    """Documents the player input schema, since FastAPI can't generate docs for PlayerInput"""
     auth0_id: str = Field(..., description=OBJ_ID_FIELD_DESC)
 
     class Config:
@@ -42,6 +55,104 @@ class PlayerInput(BaseModel):
         }
 
 
+# ---- CACHE ----
+# player documents are small, rarely change and are looked up on most requests, so recently retrieved documents are
+# kept for a short time; updates made by this process invalidate them both before and after they're written, but the
+# cache is per process, so when another worker or instance updates a player, this one can serve its previous document
+# until the TTL expires (set FASTAPI_PLAYER_CACHE_TTL to 0 to disable the cache if that matters)
+_CACHE_TTL: Final = settings.PLAYER_CACHE_TTL     # seconds
+_CACHE_MAX_SIZE: Final = 4096
+_cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+# incremented whenever a write starts or finishes; a document retrieved while the generation changed may predate the
+# write, so it isn't cached (a single counter is used, rather than one per player, so that it never needs cleaning up)
+_generation = 0
+
+
+def _get_cached(player_id: str) -> Optional[dict]:
+    """Returns a copy of the cached player document, or None if it isn't cached (or has expired)"""
+    if (entry := _cache.get(player_id)) is None:
+        return None
+    expiry, player = entry
+    if expiry < monotonic():
+        del _cache[player_id]
+        return None
+    _cache.move_to_end(player_id)
+    return deepcopy(player)    # callers may modify the document (or its lists), so never hand out the cached one
+
+
+def _set_cached(player_id: str, player: dict, generation: int) -> None:
+    """
+    Caches a copy of the player document, evicting the least recently used document if the cache is full.
+
+    :param player_id: the object id of the player
+    :param player: the player document
+    :param generation: the value of _generation when the document was queried; if a write has started or finished
+                       since, the document isn't cached (nor is it if the cache is disabled)
+    """
+    if generation != _generation or _CACHE_TTL <= 0:
+        return
+    _cache[player_id] = (monotonic() + _CACHE_TTL, deepcopy(player))
+    _cache.move_to_end(player_id)
+    if len(_cache) > _CACHE_MAX_SIZE:
+        _cache.popitem(last=False)
+
+
+def _invalidate_cached(player_id: str) -> None:
+    """Removes the player document from the cache, if present, and prevents lookups in progress from caching it"""
+    global _generation
+    _generation += 1
+    _cache.pop(str(player_id), None)
+
+
+@contextmanager
+def _invalidating(player_ids: list[str]) -> Iterator[None]:
+    """
+    Invalidates the players' cached documents and in-flight lookups before and after the body (which should write to
+    them) runs, so that neither a document cached beforehand nor one retrieved while the write was in progress can
+    outlive it.
+
+    :param player_ids: the object ids of the players being written to
+    """
+    for player_id in player_ids:
+        _invalidate_cached(player_id)
+        _forget_in_flight(player_id)
+    try:
+        yield
+    finally:
+        for player_id in player_ids:
+            _invalidate_cached(player_id)
+            _forget_in_flight(player_id)
+
+
+# ---- COALESCING ----
+# concurrent lookups of the same player by id (e.g. several requests from one client) share a single query; writes drop
+# the lookups in flight for the players they change, so that lookups started afterwards don't share a query issued
+# before the write
+_in_flight: dict[str, asyncio.Future] = {}
+
+
+def _forget_in_flight(player_id: str) -> None:
+    """Stops a lookup of the player that is in flight from being shared with new lookups"""
+    _in_flight.pop(str(player_id), None)
+
+
+async def _find_by_id_coalesced(player_id: str) -> Optional[dict]:
+    """
+    Retrieves the specified player document, sharing the result with any lookup of the same player already in flight.
+
+    :param player_id: the object id of the player
+    :return: an awaitable resolving to a copy of the matching document, or None if one is not found
+    """
+    if (future := _in_flight.get(player_id)) is None:
+        future = asyncio.ensure_future(db.player_collection.find_one({"_id": ObjectId(player_id)}))
+        _in_flight[player_id] = future
+        # a write may have dropped the future and another lookup replaced it, so only remove it if it's still there
+        future.add_done_callback(lambda done: _in_flight.pop(player_id) if _in_flight.get(player_id) is done else None)
+    # shield the query, so that one caller being cancelled doesn't cancel it for the others
+    player = await asyncio.shield(future)
+    return None if player is None else deepcopy(player)   # callers may modify the document (or its lists)
+
+
 # ---- CREATE ----
 async def create(player_input: PlayerInput) -> dict:
     """
@@ -49,14 +160,18 @@ async def create(player_input: PlayerInput) -> dict:
 
     :param player_input: input containing the player's auth0_id
     :return: an awaitable resolving to the inserted document
+    :raises DuplicateKeyError: if a player with the same auth0_id already exists
     """
-    collection = await db.get_player_collection()
-    res = await collection.insert_one({
+    collection = db.player_collection
+    player = {
         "auth0_id": player_input.auth0_id,
         "current_games": [],
         "completed_games": [],
-    })
-    return await find_by_id(res.inserted_id)
+    }
+    res = await collection.insert_one(player)
+    # the inserted document is already known, so there's no need to retrieve it
+    player["_id"] = res.inserted_id
+    return player
 
 
 # ---- RETRIEVE ----
@@ -67,8 +182,13 @@ async def find_by_id(player_id: str) -> Optional[dict]:
     :param player_id: the object id of the player
     :return: an awaitable resolving to the matching document, or None if one is not found
     """
-    collection = await db.get_player_collection()
-    return await collection.find_one({"_id": PydanticObjectID(player_id)})
+    player_id = str(player_id)
+    if (player := _get_cached(player_id)) is not None:
+        return player
+    generation = _generation
+    if (player := await _find_by_id_coalesced(player_id)) is not None:
+        _set_cached(player_id, player, generation)
+    return player
 
 
 async def find_by_auth0_id(auth0_id: str) -> Optional[dict]:
@@ -78,8 +198,7 @@ async def find_by_auth0_id(auth0_id: str) -> Optional[dict]:
     :param auth0_id: the unique auth0_id of the player
     :return: an awaitable resolving to the matching document, or None if one is not found
     """
-    collection = await db.get_player_collection()
-    return await collection.find_one({"auth0_id": auth0_id})
+    return await db.player_collection.find_one({"auth0_id": auth0_id})
 
 
 # ---- UPDATE ----
@@ -91,12 +210,13 @@ async def add_current_game(player_id: str, game_id: str) -> Optional[dict]:
     :param game_id: the object id of the game
     :return: an awaitable resolving to the updated document, or None if one is not found
     """
-    collection = await db.get_player_collection()
-    updated_player = await collection.find_one_and_update(
-        {"_id": PydanticObjectID(player_id)},
-        {"$push": {"current_games": game_id}},
-        return_document=ReturnDocument.AFTER,
-    )
+    collection = db.player_collection
+    with _invalidating([player_id]):
+        updated_player = await collection.find_one_and_update(
+            {"_id": ObjectId(player_id)},
+            {"$addToSet": {"current_games": ObjectId(game_id)}},
+            return_document=ReturnDocument.AFTER,
+        )
     return updated_player
 
 
@@ -108,12 +228,13 @@ async def remove_current_game(player_id: str, game_id: str) -> Optional[dict]:
     :param game_id: the object id of the game
     :return: an awaitable resolving to the updated document, or None if one is not found
     """
-    collection = await db.get_player_collection()
-    updated_player = await collection.find_one_and_update(
-        {"_id": PydanticObjectID(player_id)},
-        {"$pull": {"current_games": game_id}},
-        return_document=ReturnDocument.AFTER,
-    )
+    collection = db.player_collection
+    with _invalidating([player_id]):
+        updated_player = await collection.find_one_and_update(
+            {"_id": ObjectId(player_id)},
+            {"$pull": {"current_games": ObjectId(game_id)}},
+            return_document=ReturnDocument.AFTER,
+        )
     return updated_player
 
 
@@ -125,12 +246,13 @@ async def add_completed_game(player_id: str, game_id: str) -> Optional[dict]:
     :param game_id: the object id of the game
     :return: an awaitable resolving to the updated document, or None if one is not found
     """
-    collection = await db.get_player_collection()
-    updated_player = await collection.find_one_and_update(
-        {"_id": PydanticObjectID(player_id)},
-        {"$push": {"completed_games": PydanticObjectID(game_id)}},
-        return_document=ReturnDocument.AFTER,
-    )
+    collection = db.player_collection
+    with _invalidating([player_id]):
+        updated_player = await collection.find_one_and_update(
+            {"_id": ObjectId(player_id)},
+            {"$addToSet": {"completed_games": ObjectId(game_id)}},
+            return_document=ReturnDocument.AFTER,
+        )
     return updated_player
 
 
@@ -143,12 +265,13 @@ async def remove_completed_game(player_id: str, game_id: str) -> Optional[dict]:
 
     :return: an awaitable resolving to the updated document, or None if one is not found
     """
-    collection = await db.get_player_collection()
-    updated_player = await collection.find_one_and_update(
-        {"_id": PydanticObjectID(player_id)},
-        {"$pull": {"completed_games": PydanticObjectID(game_id)}},
-        return_document=ReturnDocument.AFTER,
-    )
+    collection = db.player_collection
+    with _invalidating([player_id]):
+        updated_player = await collection.find_one_and_update(
+            {"_id": ObjectId(player_id)},
+            {"$pull": {"completed_games": ObjectId(game_id)}},
+            return_document=ReturnDocument.AFTER,
+        )
     return updated_player
 
 
@@ -161,18 +284,63 @@ async def move_current_game_to_completed(player_id: str, game_id: str) -> Option
     :param game_id: the object id of the game
     :return: an awaitable resolving to the updated document, or None if one is not found
     """
-    collection = await db.get_player_collection()
-    updated_player = await collection.find_one_and_update(
-        {"_id": PydanticObjectID(player_id)},
-        {
-            "$pull": {"current_games": PydanticObjectID(game_id)},
-            "$push": {"completed_games": PydanticObjectID(game_id)},
-        },
-        return_document=ReturnDocument.AFTER,
-    )
+    collection = db.player_collection
+    game_id = ObjectId(game_id)     # convert once, since it's used twice
+    with _invalidating([player_id]):
+        updated_player = await collection.find_one_and_update(
+            {"_id": ObjectId(player_id)},
+            {
+                "$pull": {"current_games": game_id},
+                "$addToSet": {"completed_games": game_id},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
     return updated_player
 
 
+async def _bulk_update(player_ids: list[str], update: dict) -> int:
+    """
+    Helper for the bulk update functions. Applies the same update to each of the players, in a single round trip.
+
+    :param player_ids: the object ids of the players
+    :param update: the update to apply to each player document
+    :return: an awaitable resolving to the number of matching player documents
+    """
+    collection = db.player_collection
+    with _invalidating(player_ids):
+        result = await collection.bulk_write(
+            [UpdateOne({"_id": ObjectId(player_id)}, update) for player_id in player_ids],
+            ordered=False,  # the updates are independent of each other
+        )
+    return result.matched_count
+
+
+async def bulk_add_current_game(player_ids: list[str], game_id: ObjectId) -> int:
+    """
+    Updates each of the players' current games by adding a game to it, in a single round trip.
+
+    :param player_ids: the object ids of the players
+    :param game_id: the object id of the game
+    :return: an awaitable resolving to the number of matching player documents
+    """
+    return await _bulk_update(player_ids, {"$addToSet": {"current_games": game_id}})
+
+
+async def bulk_move_current_game_to_completed(player_ids: list[str], game_id: ObjectId) -> int:
+    """
+    Updates each of the players' current_games ***and*** completed_games by removing the specified game from
+    current_games and adding it to completed_games, in a single round trip.
+
+    :param player_ids: the object ids of the players
+    :param game_id: the object id of the game
+    :return: an awaitable resolving to the number of matching player documents
+    """
+    return await _bulk_update(
+        player_ids,
+        {"$pull": {"current_games": game_id}, "$addToSet": {"completed_games": game_id}},
+    )
+
+
 # ---- DELETE ----
 async def delete(player_id: str) -> int:
     """
@@ -181,6 +349,7 @@ async def delete(player_id: str) -> int:
     :param player_id: the object id of the player
     :return: an awaitable resolving to the number of deleted documents
     """
-    collection = await db.get_player_collection()
-    deleted = await collection.delete_one({"_id": PydanticObjectID(player_id)})
+    collection = db.player_collection
+    with _invalidating([player_id]):
+        deleted = await collection.delete_one({"_id": ObjectId(player_id)})
     return deleted.deleted_count
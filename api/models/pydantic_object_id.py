@@ -2,6 +2,7 @@
 # Description: Implements a validator for BSON object IDs
 #              (see https://pydantic-docs.helpmanual.io/usage/types/#classes-with-__get_validators__)
 
+from typing import Union
 from bson import ObjectId
 
 
@@ -17,10 +18,15 @@ class PydanticObjectID(ObjectId):
         field_schema.update(type="string")
 
     @classmethod
-    def validate(cls, oid: ObjectId):
-        if not isinstance(oid, ObjectId):
+    def validate(cls, oid: Union[str, ObjectId]) -> ObjectId:
+        # accept both ObjectIds and their string form, converting the latter only once
+        if isinstance(oid, ObjectId):
+            return oid
+        if not isinstance(oid, str):
             raise TypeError(f"Unsupported type {oid.__class__}")
-        return str(oid)
+        if not ObjectId.is_valid(oid):
+            raise ValueError(f"Invalid ObjectId {oid}")
+        return ObjectId(oid)
 
     def __repr__(self):
-        return f"PydanticObjectID{super().__repr__})"
+        return f"PydanticObjectID({str(self)!r})"
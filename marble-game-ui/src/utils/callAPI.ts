@@ -177,11 +177,12 @@ export async function getUserCompletedGames(playerID: string, skip: number, limi
 /**
  * Mutates gameResponse by decoding its game_state from JSON object to {@link GameState}
  * 
- * @param gameResponse object containing JSON-encoded `game_state`
+ * @param gameResponse object containing `game_state`, which may be JSON-encoded (older games) or already decoded
  * 
  */
 function decodeGameResponse (gameResponse: any) {
-    if (!gameResponse.hasOwnProperty('game_state')) {
+    // newer games' states are sent as objects, so there's nothing to decode
+    if (!gameResponse.hasOwnProperty('game_state') || typeof gameResponse.game_state !== 'string') {
         return;
     }
 
@@ -18,87 +18,51 @@
 # Description: Contains logic for an AI that plays the marble game.
 
 from __future__ import annotations
-from dataclasses import dataclass, field
+from dataclasses import dataclass
+from functools import partial
 from typing import Callable, Final, Union
-from pickle import dumps as pickle, loads as unpickle
 from .marble_game import MarbleGame
 
 # define constants
 POS_INF: Final = float("inf")
 NEG_INF: Final = float("-inf")
+TOTAL_MARBLES: Final = 29   # the number of marbles on the board at the start of a game
 
+# every game starts from the same position, so the AI searches the same openings over and over; until a marble has been
+# pushed off, the heuristic is 0 for every player, so the AI's move only depends on the board, its color and the search
+# depth, and can be reused; keyed by (board state, AI color, search depth)
+OPENING_CACHE_MAX_SIZE: Final = 4096   # the cache is emptied when it reaches this size
+_opening_moves: dict[tuple[tuple[bytes, bytes], str, int], tuple[tuple[int, int], str]] = {}
 
-@dataclass
+
+@dataclass(slots=True)
 class Node:
     """Represents a node in the decision tree"""
-    game_state: MarbleGame
+    game_state: MarbleGame                          # shared by every node; only valid while the node is being searched
     value: Union[int, float]
-    move: tuple[tuple[int, int], str] = None        # this *must* be filled when depth == 1
-    parent: Node = None                             # None => root node
-    children: list = field(default_factory=list)    # empty => leaf node
-
-    def add_child(self, node: Node):
-        """Adds the specified node as a child of this node, and updates its parent to refer to this node"""
-        node.parent = self
-        self.children.append(node)
-
-    def __eq__(self, other):
-        if isinstance(other, Node):
-            return self.value == other.value
-        if isinstance(other, (int, float)):
-            return self.value == other
-        return NotImplemented
-
-    def __lt__(self, other):
-        if isinstance(other, Node):
-            return self.value < other.value
-        if isinstance(other, (int, float)):
-            return self.value < other
-        return NotImplemented
-
-    def __le__(self, other):
-        if isinstance(other, Node):
-            return self.value <= other.value
-        if isinstance(other, (int, float)):
-            return self.value <= other
-        return NotImplemented
-
-    def __gt__(self, other):
-        if isinstance(other, Node):
-            return self.value > other.value
-        if isinstance(other, (int, float)):
-            return self.value > other
-        return NotImplemented
-
-    def __ge__(self, other):
-        if isinstance(other, Node):
-            return self.value >= other.value
-        if isinstance(other, (int, float)):
-            return self.value >= other
-        return NotImplemented
-
-
-def heuristic_factory(maximizer_id: str, minimizer_id: str) -> Callable[[MarbleGame], Union[int, float]]:
+    move: tuple[tuple[int, int], str] = None        # the first move made to reach this node; None => root node
+
+
+def heuristic(maximizer_id: str, minimizer_id: str, game: MarbleGame) -> Union[int, float]:
     """
-    Creates a function that returns the heuristic value of a MarbleGame.
+    Returns the heuristic value of a MarbleGame. Bind the player IDs (e.g. with functools.partial) to obtain a function
+    that can be passed to alpha_beta_search.
 
     :param maximizer_id: the player ID of the maximizing player
     :param minimizer_id: the player ID of the minimizing player
-    :return: a closure that returns the heuristic value of a MarbleGame
+    :param game: the game to evaluate
+    :return: the heuristic value of the game
     """
-    def heuristic(game: MarbleGame) -> Union[int, float]:
-        """Returns the heuristic value of the game"""
-        # calculate the delta between the maximizer's "score" and the minimizer's
-        maximizer_score = game.get_captured(maximizer_id) + game.get_opponent_captured(maximizer_id)
-        minimizer_score = game.get_captured(minimizer_id) + game.get_opponent_captured(minimizer_id)
-        value = maximizer_score - minimizer_score
-        # if one of the players has won, pad the score
-        if game.winner == maximizer_id:
-            value += 100
-        if game.winner == minimizer_id:
-            value -= 100
-        return maximizer_score - minimizer_score
-    return heuristic
+    # calculate the delta between the maximizer's "score" and the minimizer's
+    maximizer_score = game.get_captured(maximizer_id) + game.get_opponent_captured(maximizer_id)
+    minimizer_score = game.get_captured(minimizer_id) + game.get_opponent_captured(minimizer_id)
+    value = maximizer_score - minimizer_score
+    # if one of the players has won, pad the score
+    if game.winner == maximizer_id:
+        value += 100
+    elif game.winner == minimizer_id:
+        value -= 100
+    return value
 
 
 def alpha_beta_search(
@@ -121,19 +85,20 @@ def alpha_beta_search(
     :param maximizer_id: the player ID of the maximizing player
     :param minimizer_id: the player ID of the minimizing player
     :param maximum_search_depth: the maximum depth to search the decision tree
-    :return: the node that results in the best state for the maximizer
+    :return: the node that results in the best state for the maximizer; its move is the first move the maximizer
+             should make to reach it
     """
     # this is just a wrapper for alpha_beta_helper
     def alpha_beta_helper(
-            current: Node, depth_remaining: int, alpha: Union[Node, float], beta: Union[Node, float], maximizer: bool
+            current: Node, depth_remaining: int, alpha: Union[int, float], beta: Union[int, float], maximizer: bool
     ) -> Node:
         """
         Helper function for alpha_beta_search.
 
         :param current: the node currently being visited (initially, the root node passed to the outer function)
         :param depth_remaining: the remaining depth to search the tree (initially, the maximum search depth)
-        :param alpha: the node with the best value found so far for the maximizer (initially, -inf)
-        :param beta: the node with the best value found so far for the minimizer (initially, +inf)
+        :param alpha: the best value found so far for the maximizer (initially, -inf)
+        :param beta: the best value found so far for the minimizer (initially, +inf)
         :param maximizer: True if it's the maximizing player's turn, otherwise False
         :return: the node that results in the best state for the maximizer
         """
@@ -143,34 +108,43 @@ def alpha_beta_search(
         # recursive step: generate and search child nodes depth-first, keeping track of alpha (maximizer's best) and
         #                 beta (minimizer's best) and short-circuiting the search when a node that yields a worse result
         #                 for the player is found
-        saved_game_state = pickle(current.game_state)   # save game state so we can copy it later
+        # moves are made on the current game and undone once searched, rather than made on copies of the game; the
+        # nodes aren't linked into a tree, but each one records the first move made to reach it
+        game = current.game_state
+        # alpha-beta prunes the most when the best moves are searched first; since the heuristic rewards captures,
+        # moves that capture a marble are searched first (except at the last level, where it costs more than it saves)
+        order_moves = depth_remaining > 1
         if maximizer:
-            best_node = NEG_INF
-            for move in current.game_state.generate_possible_moves(maximizer_id):
+            best_node, best_value = None, NEG_INF
+            for move in game.generate_possible_moves(maximizer_id, captures_first=order_moves):
                 # generate child node
-                new_game_state: MarbleGame = unpickle(saved_game_state)
-                new_game_state.make_move(maximizer_id, *move)
-                child = Node(new_game_state, heuristic_function(new_game_state), move)
-                current.add_child(child)
+                game.push_move(maximizer_id, *move, validate=False)   # generated moves are already known to be valid
+                child = Node(game, heuristic_function(game), move if current.move is None else current.move)
                 # continue searching
-                best_node = max(best_node, alpha_beta_helper(child, depth_remaining - 1, alpha, beta, False))
-                alpha = max(best_node, alpha)
-                if alpha >= beta:
-                    return alpha
+                result = alpha_beta_helper(child, depth_remaining - 1, alpha, beta, False)
+                game.pop_move()
+                if result.value > best_value:
+                    best_node, best_value = result, result.value
+                    if best_value > alpha:
+                        alpha = best_value
+                        if alpha >= beta:
+                            break
             return best_node
         else:
-            best_node = POS_INF
-            for move in current.game_state.generate_possible_moves(minimizer_id):
+            best_node, best_value = None, POS_INF
+            for move in game.generate_possible_moves(minimizer_id, captures_first=order_moves):
                 # generate child node
-                new_game_state: MarbleGame = unpickle(saved_game_state)
-                new_game_state.make_move(minimizer_id, *move)
-                child = Node(new_game_state, heuristic_function(new_game_state), move)
-                current.add_child(child)
+                game.push_move(minimizer_id, *move, validate=False)   # generated moves are already known to be valid
+                child = Node(game, heuristic_function(game), move if current.move is None else current.move)
                 # continue searching
-                best_node = min(best_node, alpha_beta_helper(child, depth_remaining - 1, alpha, beta, True))
-                beta = min(best_node, beta)
-                if beta <= alpha:
-                    return beta
+                result = alpha_beta_helper(child, depth_remaining - 1, alpha, beta, True)
+                game.pop_move()
+                if result.value < best_value:
+                    best_node, best_value = result, result.value
+                    if best_value < beta:
+                        beta = best_value
+                        if beta <= alpha:
+                            break
             return best_node
     return alpha_beta_helper(root_node, maximum_search_depth, NEG_INF, POS_INF, True)
 
@@ -185,17 +159,26 @@ def make_move_ai(ai_id: str, game: MarbleGame, max_depth: int = 3) -> bool:
     :return: True if the move is successful, otherwise False
     """
     # ensure the AI player is able to make a move
-    if game.winner is not None or game.current_turn not in {None, ai_id} or ai_id not in game.player_ids:
+    current_turn = game.current_turn
+    if game.winner is not None or (current_turn is not None and current_turn != ai_id) or ai_id not in game.player_ids:
         return False
 
-    # construct the decision tree
-    opponent_id = game.player_ids.difference({ai_id}).pop()        # it's guaranteed that ai_id is in game.players
-    heuristic_function = heuristic_factory(ai_id, opponent_id)
-    decision_tree_root = Node(game, heuristic_function(game))
+    # if this is an opening the AI has already searched, make the same move
+    opening_key = None
+    if sum(game.marble_count) == TOTAL_MARBLES:
+        opening_key = (game.board_state, game.get_player_color(ai_id), max_depth)
+        if (move := _opening_moves.get(opening_key)) is not None:
+            return game.make_move(ai_id, *move)
+
+    # set up the search
+    opponent_id = game.get_opponent(ai_id)
+    heuristic_function = partial(heuristic, ai_id, opponent_id)
+    root_node = Node(game, heuristic_function(game))
 
     # get the best possible end state for the AI player and make the move that would lead the AI there
-    node = alpha_beta_search(decision_tree_root, heuristic_function, ai_id, opponent_id, max_depth)
-    # search for and return the move that resulted in the
-    while node.parent is not decision_tree_root:
-        node = node.parent
+    node = alpha_beta_search(root_node, heuristic_function, ai_id, opponent_id, max_depth)
+    if opening_key is not None:
+        if len(_opening_moves) >= OPENING_CACHE_MAX_SIZE:
+            _opening_moves.clear()
+        _opening_moves[opening_key] = node.move
     return game.make_move(ai_id, *node.move)
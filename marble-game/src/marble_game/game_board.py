@@ -18,9 +18,7 @@
 # Description: Contains backend logic for the game board. Responsible for containing & counting marbles, validating
 #              coordinates, making & simulating moves, and communicating each grid square's contents.
 #
-from typing import Any, Final, Generator, Optional
-from itertools import chain
-from dataclasses import dataclass
+from typing import Final, Generator, Optional
 import json
 
 
@@ -29,38 +27,84 @@ class IllegalMoveException(Exception):
     pass
 
 
-@dataclass
-class Square:
-    """A mutable container for a single-character string (or None). Represents a square on the game board."""
-    _contents: Optional[str] = None
+def _get_ray(index: int, row_step: int, column_step: int) -> tuple[int, int]:
+    """
+    Returns bitboards (as in GameBoard._get_bitboard) of the squares from a square to the edge of the board in the
+    specified direction, and of the square on that edge. Used to build GameBoard._rays.
+
+    :param index: the grid index of the square
+    :param row_step: -1, 0 or 1; the change in row between adjacent squares in the direction
+    :param column_step: -1, 0 or 1; the change in column between adjacent squares in the direction
+    :return: (ray, edge) bitboards
+    """
+    row, column = divmod(index, 7)
+    ray = 0
+    while 0 <= row < 7 and 0 <= column < 7:
+        edge = 1 << (8 * (row * 7 + column))
+        ray |= edge
+        row, column = row + row_step, column + column_step
+    return ray, edge
+
+
+def _get_ray_slice(index: int, row_step: int, column_step: int) -> slice:
+    """
+    Returns a slice of the grid indices of the squares from a square to the edge of the board in the specified
+    direction, in order. Used to build GameBoard._ray_slices.
+
+    :param index: the grid index of the square
+    :param row_step: -1, 0 or 1; the change in row between adjacent squares in the direction
+    :param column_step: -1, 0 or 1; the change in column between adjacent squares in the direction
+    :return: the slice, whose step is the change in grid index between adjacent squares
+    """
+    row, column = divmod(index, 7)
+    stride = row_step * 7 + column_step
+    length = 1
+    while 0 <= row + row_step * length < 7 and 0 <= column + column_step * length < 7:
+        length += 1
+    stop = index + stride * length
+    return slice(index, stop if stop >= 0 else None, stride)   # a negative stop would count from the end
 
-    @property
-    def contents(self) -> Any:
-        """The contents of the Square"""
-        return self._contents
-
-    @contents.setter
-    def contents(self, value: Optional[str]):
-        self._contents = value
-
-    def __eq__(self, other):
-        if not isinstance(other, Square):
-            return NotImplemented
-        return self._contents == other._contents
 
-    def __str__(self):
-        return str(self._contents)
-
-    def __repr__(self):
-        return f"Square(id={hex(id(self))} _contents= {self._contents})"
+class GameBoard:
+    """
+    Represents 7 x 7 game board composed of 49 squares and intended to be indexed by (row, column).
 
+    The squares are stored row-by-row in a flat bytearray of ASCII characters ('W', 'B', 'R', ' '), so the square at
+    (row, column) is located at index row * 7 + column.
+    """
 
-class GameBoard:
-    """Represents 7 x 7 game board composed of 49 Squares and intended to be indexed by (row, column)."""
+    # slots make instances smaller and their attributes faster to access, which the AI search does for every node
+    __slots__ = ("_grid", "_previous_state")
 
     # class variables
     _max_index: Final = 6  # the board is a square
-    _direction_to_step: Final = {'F': -1, 'B': 1, 'L': -1, 'R': 1}  # maps directions to a step (for indexing)
+    _size: Final = 7       # the number of squares along each side of the board
+    _empty: Final = ord(' ')  # the byte stored in empty squares
+    _directions: Final = frozenset({'L', 'R', 'F', 'B'})
+    _coordinates: Final = tuple((row, column) for row in range(7) for column in range(7))  # indexed by grid index
+
+    # bitboards: translating the grid with one of these tables and reading the result as a little-endian int gives an
+    # int with one byte per square, in which the lowest bit of byte i is set if square i contains the color (or is
+    # empty); shifting it by one byte moves to the adjacent column, and by seven bytes to the adjacent row
+    _bitboard_tables: Final = {
+        contents: bytes(1 if byte == ord(contents) else 0 for byte in range(256)) for contents in ('W', 'B', 'R', ' ')
+    }
+    _first_row: Final = sum(1 << (8 * index) for index in range(0, 7))
+    _last_row: Final = sum(1 << (8 * index) for index in range(42, 49))
+    _first_column: Final = sum(1 << (8 * index) for index in range(0, 49, 7))
+    _last_column: Final = sum(1 << (8 * index) for index in range(6, 49, 7))
+    # maps each direction to a tuple, indexed by grid index, of (ray, edge) bitboards: the squares from that square to
+    # the edge of the board in that direction (inclusive), and the square on that edge
+    _rays: Final = {
+        direction: tuple(_get_ray(index, row_step, column_step) for index in range(49))
+        for direction, row_step, column_step in (('F', -1, 0), ('B', 1, 0), ('L', 0, -1), ('R', 0, 1))
+    }
+    # maps each direction to a tuple, indexed by grid index, of slices of the grid from that square to the edge of the
+    # board in that direction; pushing a marble only changes the squares in its slice
+    _ray_slices: Final = {
+        direction: tuple(_get_ray_slice(index, row_step, column_step) for index in range(49))
+        for direction, row_step, column_step in (('F', -1, 0), ('B', 1, 0), ('L', 0, -1), ('R', 0, 1))
+    }
 
     def __init__(self, **kwargs):
         """
@@ -85,53 +129,90 @@ class GameBoard:
         if prev_string is not None and len(prev_string) != 49:
             raise ValueError("prev_string must contain exactly 49 chars")
 
-        # initialize the grid
-        self._grid = [[Square() for _ in range(7)] for _ in range(7)]
-        for index in range(49):
-            if grid_string[index] != ' ':
-                # the row is located at index // 7, the column at index % 7
-                self._grid[index // 7][index % 7].contents = grid_string[index]
-
-        # initialize previous state
-        self._previous_state = [[Square() for _ in range(7)] for _ in range(7)]
-        if prev_string is not None:
-            for index in range(49):
-                if prev_string[index] != ' ':
-                    # the row is located at index // 7, the column at index % 7
-                    self._previous_state[index // 7][index % 7].contents = prev_string[index]
+        # initialize the grid and previous state; this will throw ValueError if either contains non-ASCII chars
+        self._grid = bytearray(grid_string, "ascii")
+        self._previous_state = b' ' * 49 if prev_string is None else bytes(prev_string, "ascii")
 
     @property
     def marble_count(self) -> tuple[int, int, int]:
         """The number of white, black and red marbles (in that order) present on the game board"""
-        # initialize marble counters
-        white_marble_count, black_marble_count, red_marble_count = 0, 0, 0
-
-        # count the marbles (we can ignore any empty cells)
-        for coordinates in self.generate_all_row_and_column_combinations():
-            contents = self.get_contents_at_position(coordinates)
-            if contents == 'W':
-                white_marble_count += 1
-            elif contents == 'B':
-                black_marble_count += 1
-            elif contents == 'R':
-                red_marble_count += 1
-        return white_marble_count, black_marble_count, red_marble_count
+        return self._grid.count(b'W'), self._grid.count(b'B'), self._grid.count(b'R')
 
     @property
     def grid_as_str(self) -> str:
         """A 49-char string representation of grid"""
-        return ''.join([str(square) for square in chain(*self._grid)]).replace('None', ' ')
+        return self._grid.decode("ascii")
 
     @property
     def previous_grid_as_str(self) -> str:
         """A 49-char string representation of previous_grid"""
-        return ''.join([str(square) for square in chain(*self._previous_state)]).replace('None', ' ')
+        return self._previous_state.decode("ascii")
+
+    def save_state(self) -> tuple[bytes, bytes]:
+        """Returns a snapshot of the grid and previous state, which can be passed to restore_state"""
+        return bytes(self._grid), self._previous_state
+
+    def restore_state(self, state: tuple[bytes, bytes]):
+        """
+        Restores the grid and previous state from a snapshot returned by save_state
+
+        :param state: the snapshot to restore
+        """
+        grid, self._previous_state = state
+        self._grid = bytearray(grid)
 
     def generate_all_row_and_column_combinations(self) -> Generator[tuple[int, int], None, None]:
         """Generates all the possible (row, column) combinations for the GameBoard"""
-        for row_index in range(self._max_index + 1):
-            for column_index in range(self._max_index + 1):
-                yield row_index, column_index
+        yield from self._coordinates
+
+    def _get_bitboard(self, contents: str) -> int:
+        """
+        Returns a bitboard of the squares with the specified contents (see _bitboard_tables)
+
+        :param contents: 'W', 'B', 'R' or ' ' (for empty squares)
+        """
+        return int.from_bytes(self._grid.translate(self._bitboard_tables[contents]), "little")
+
+    def generate_pushable_marbles(
+            self, color: str, skip_push_offs: bool = False
+    ) -> Generator[tuple[tuple[int, int], str], None, None]:
+        """
+        Generates the coordinates of each marble of the specified color that can be pushed, along with the direction
+        it can be pushed in, row-by-row. A marble can be pushed in a direction if the square opposite that direction is
+        empty (or it's on the edge of the board); for each marble, directions are generated in the order 'B', 'F', 'R',
+        'L'. This doesn't check whether the push would violate the Ko rule or, unless skip_push_offs is True, push off
+        a marble of the same color (see simulate_move).
+
+        :param color: the color of the marbles ('W' or 'B')
+        :param skip_push_offs: if True, pushes that would push a marble of the same color off the board are skipped
+        """
+        marbles = self._get_bitboard(color)
+        empty = self._get_bitboard(' ')
+        # a marble can be pushed in a direction if the square it's being pushed away from is empty or off the board;
+        # shifting the empty squares onto their neighbors also shifts some onto the opposite edge, but the edge squares
+        # can always be pushed away from it anyway
+        pushable = (
+            ('B', marbles & ((empty << 56) | self._first_row)),     # above is empty (or the edge)
+            ('F', marbles & ((empty >> 56) | self._last_row)),      # below is empty (or the edge)
+            ('R', marbles & ((empty << 8) | self._first_column)),   # left is empty (or the edge)
+            ('L', marbles & ((empty >> 8) | self._last_column)),    # right is empty (or the edge)
+        )
+        candidates = pushable[0][1] | pushable[1][1] | pushable[2][1] | pushable[3][1]
+        rays = self._rays
+        # visit the candidates in order, by repeatedly taking the lowest set bit
+        while candidates:
+            square = candidates & -candidates
+            candidates ^= square
+            index = (square.bit_length() - 1) >> 3
+            coordinates = self._coordinates[index]
+            for direction, bitboard in pushable:
+                if bitboard & square:
+                    if skip_push_offs:
+                        # the marble on the edge is pushed off if the ray has no empty squares; skip it if it's ours
+                        ray, edge = rays[direction][index]
+                        if marbles & edge and not empty & ray:
+                            continue
+                    yield coordinates, direction
 
     def get_contents_at_position(self, coordinates: tuple[int, int]) -> Optional[str]:
         """
@@ -140,7 +221,8 @@ class GameBoard:
         :param coordinates: (row, column) of the square
         """
         row_index, column_index = coordinates
-        return self._grid[row_index][column_index].contents
+        contents = self._grid[row_index * self._size + column_index]
+        return None if contents == self._empty else chr(contents)
 
     def is_valid_square(self, coordinates: tuple[int, int]) -> bool:
         """
@@ -158,17 +240,14 @@ class GameBoard:
 
         :param coordinates: (row, column) of the square
         """
-        return self.get_contents_at_position(coordinates) is None
+        row_index, column_index = coordinates
+        return self._grid[row_index * self._size + column_index] == self._empty
 
-    def _deepcopy_grid(self) -> list[list]:
+    def _deepcopy_grid(self) -> bytearray:
         """
         Returns a deepcopy of the GameBoard's grid
         """
-        grid_copy = []
-        for row in self._grid:
-            row_copy = [Square(square.contents) for square in row]
-            grid_copy.append(row_copy)
-        return grid_copy
+        return bytearray(self._grid)
 
     def _validate_move(self, coordinates: tuple[int, int], direction):
         """
@@ -178,11 +257,14 @@ class GameBoard:
         :param str direction: the direction to push the marble ('L', 'R', 'F' or 'B')
         :raises IllegalMoveException: if the move is not defined
         """
-        # validate the coordinates
-        if not self.is_valid_square(coordinates) or self.is_empty_position(coordinates):
+        # validate the coordinates (as in is_valid_square and is_empty_position, without calling them)
+        row_index, column_index = coordinates
+        if not (0 <= row_index <= self._max_index and 0 <= column_index <= self._max_index):
+            raise IllegalMoveException
+        if self._grid[row_index * self._size + column_index] == self._empty:
             raise IllegalMoveException
         # validate the direction
-        if direction not in {'L', 'R', 'F', 'B'}:
+        if direction not in self._directions:
             raise IllegalMoveException
 
     def move_marble(self, coordinates: tuple[int, int], direction: str) -> Optional[str]:
@@ -192,26 +274,17 @@ class GameBoard:
 
         :param coordinates: (row, column) of the marble being pushed
         :param direction: the direction to push the marble ('L', 'R', 'F' or 'B')
-        :returns: the contents of the Square pushed off the game board as a result of the move
+        :returns: the contents of the square pushed off the game board as a result of the move
                   ('W', 'B' or 'R if a marble has been pushed off the game board, otherwise None)
         :raises IllegalMoveException: if the direction is undefined, the square doesn't exist, or the square is empty
         """
         self._validate_move(coordinates, direction)
         # save the board state (so we can check for ko rule compliance later)
-        self._previous_state = self._deepcopy_grid()
+        self._previous_state = bytes(self._grid)
 
         # push the marble along the appropriate axis
-        step = self._direction_to_step[direction]
-        if direction in {'F', 'B'}:
-            # fix column index, vary row index; the Square's initial index along column is its original row position
-            index_along_axis, fixed_index = coordinates
-            axis = [self._grid[row_index][fixed_index] for row_index in range(self._max_index + 1)]
-        else:
-            # fix row index, vary column index; the Square's initial index along row is its original column position
-            fixed_index, index_along_axis = coordinates
-            axis = [self._grid[fixed_index][column_index] for column_index in range(self._max_index + 1)]
-
-        return self._push_marble(axis, index_along_axis, step)
+        row_index, column_index = coordinates
+        return self._push_marble(self._grid, self._ray_slices[direction][row_index * self._size + column_index])
 
     def simulate_move(self, coordinates: tuple[int, int], direction: str) -> Optional[str]:
         """
@@ -226,110 +299,92 @@ class GameBoard:
         :param coordinates: (row, column) coordinates of marble being pushed
         :param direction: the direction to push the marble ('L', 'R', 'F' or 'B')
         :returns: "previous" if the proposed move would return the board to its previous state, otherwise the
-                  the contents of the Square that would be pushed off the board as a result of the move (or
+                  the contents of the square that would be pushed off the board as a result of the move (or
                   None if nothing would be pushed off)
         :raises IllegalMoveException: if the direction is undefined, the square doesn't exist, or the square is empty
         """
         self._validate_move(coordinates, direction)
+        return self._simulate_move(coordinates, direction)
 
-        # push the marble along the appropriate axis, but on a deepcopy of the grid since we're just simulating it
-        grid_copy = self._deepcopy_grid()
-        step = self._direction_to_step[direction]
-        if direction in {'F', 'B'}:
-            # fix column index, vary row index; the Square's initial index along column is its original row position
-            index_along_axis, fixed_index = coordinates
-            axis = [grid_copy[row_index][fixed_index] for row_index in range(self._max_index + 1)]
-        else:
-            # fix row index, vary column index; the Square's initial index along row is its original column position
-            fixed_index, index_along_axis = coordinates
-            axis = [grid_copy[fixed_index][column_index] for column_index in range(self._max_index + 1)]
-
-        # simulate the move and save the value that is pushed off
-        pushed_off = self._push_marble(axis, index_along_axis, step)
+    def _simulate_move(self, coordinates: tuple[int, int], direction: str) -> Optional[str]:
+        """
+        Helper method for simulate_move. Simulates a potential move as in simulate_move, without checking whether the
+        move is defined; this should only be called directly for moves already known to be defined, e.g. those
+        generated by generate_pushable_marbles.
 
-        # check whether the proposed move would recreate the previous state
-        for row_index, column_index in self.generate_all_row_and_column_combinations():
-            # get the contents of the position that would result from the simulated move and its previous contents
-            simulated_state = grid_copy[row_index][column_index].contents
-            previous_state = self._previous_state[row_index][column_index].contents
+        :param coordinates: (row, column) coordinates of marble being pushed
+        :param direction: the direction to push the marble ('L', 'R', 'F' or 'B')
+        :returns: "previous" if the proposed move would return the board to its previous state, otherwise the
+                  the contents of the square that would be pushed off the board as a result of the move (or
+                  None if nothing would be pushed off)
+        """
+        # push the marble along the appropriate axis, but on a copy of the grid since we're just simulating it
+        grid_copy = self._deepcopy_grid()
+        row_index, column_index = coordinates
+        pushed_off = self._push_marble(grid_copy, self._ray_slices[direction][row_index * self._size + column_index])
 
-            if simulated_state != previous_state:
-                # at least one square differs, so the previous state isn't recreated
-                return pushed_off
+        # if every square matches, the proposed move would recreate the previous state and violates the Ko rule
+        return "previous" if grid_copy == self._previous_state else pushed_off
 
-        # if we get here, then the proposed move would recreate the previous state and violates the Ko rule
-        return "previous"
+    def _violates_ko_rule(self, coordinates: tuple[int, int], direction: str) -> bool:
+        """
+        Returns True if the proposed move would return the board to its previous state, as in simulate_move, without
+        checking whether the move is defined; this should only be called for moves already known to be defined.
 
-    def _push_marble(self, axis: list[Square], current_position: int, step: int, previous: Square = None) -> Optional[str]:
+        :param coordinates: (row, column) coordinates of marble being pushed
+        :param direction: the direction to push the marble ('L', 'R', 'F' or 'B')
         """
-        Helper method for move_marble and simulate_move. Pushes a marble along the specific axis, mutating the
-        Squares along it to reflect their post-push contents.
+        # a push always leaves the pushed marble's square empty, so unless that square was empty in the previous state,
+        # the move can't recreate it (which is almost always the case); only otherwise does it need to be simulated
+        row_index, column_index = coordinates
+        if self._previous_state[row_index * self._size + column_index] != self._empty:
+            return False
+        return self._simulate_move(coordinates, direction) == "previous"
 
-        When first called, current_position should be the index of the Square that contains the marble being pushed,
-        and previous_square should be None.
+    def _push_marble(self, grid: bytearray, ray: slice) -> Optional[str]:
+        """
+        Helper method for move_marble and simulate_move. Pushes a marble along the specified ray, mutating the squares
+        along it to reflect their post-push contents.
 
         The move should be checked for legality **before** calling this method. Assumes:
-          - the Square at the specified coordinates exists
-          - the Square contains a marble
+          - the square at the start of the ray exists
+          - the square contains a marble
           - moving the marble in the specified direction constitutes a legal move
-          - current_position has been set to the index of the Square that contains the marble being pushed
-          - previous_square is None
-
-        :param axis: list of Squares
-        :param current_position: the index of our current position on the axis
-        :param step: -1 to push left (or up) along the axis, or +1 to push right (or down) along the axis
-        :param previous: the square being moved
-        :returns: the contents of the Square that pushed off the game board as a result of the proposed move
+
+        :param grid: the grid being pushed on
+        :param ray: a slice of the grid from the square containing the marble being pushed to the edge of the board,
+                    in the direction it's being pushed (see _ray_slices)
+        :returns: the contents of the square that pushed off the game board as a result of the proposed move
                   (or None if nothing is pushed off)
         """
-        if previous is None:
-            previous = Square()  # when the first marble is moved, its original space becomes empty
-
-        # base case: we've moved off the edge of the game board
-        if current_position < 0 or current_position > len(axis) - 1:
-            return previous.contents
-        # recursive step: move the contents of the previous square into the current one
+        # every marble up to the first empty square along the ray moves one square, which is the same as removing that
+        # empty square (or, if there isn't one, the marble on the edge) and leaving an empty square behind the pusher
+        squares = grid[ray]
+        first_empty = squares.find(self._empty)
+        if first_empty == -1:
+            pushed_off = chr(squares.pop())
         else:
-            previous_contents = previous.contents
-            current_contents = axis[current_position].contents
-            # check whether we're pushing a marble into an empty square
-            reached_empty = current_contents is None
-            # swap the contents to move the marble into the current square
-            axis[current_position].contents = previous_contents
-            previous.contents = current_contents
-
-            # if we pushed a marble into an empty square, we're done (and no marble was pushed off)
-            return None if reached_empty else self._push_marble(axis, current_position + step, step, previous)
+            del squares[first_empty]
+            pushed_off = None
+        squares.insert(0, self._empty)
+        grid[ray] = squares
+        return pushed_off
 
     def __str__(self):
         result = []
-        for row in self._grid:
-            for square in row:
-                if square.contents is None:  # the square is empty
-                    result.append("  ")
-                else:
-                    result.append(str(square) + ' ')
-            result.append('\n')
+        for index, contents in enumerate(self.grid_as_str, start=1):
+            result.append(contents + ' ')  # empty squares are already represented by ' '
+            if index % self._size == 0:
+                result.append('\n')
         return ''.join(result)
 
     def __repr__(self):
-        # build a string representation of the grids
-        if self._previous_state is None:
-            previous_state_representation = "None"
-        else:
-            previous_state_representation = [repr(row) for row in self._previous_state]
-        grid_representation = [repr(row) for row in self._grid]
-
-        # replace "None" with the unicode 'NUL' representation to align output
-        null_char = '\u2400'
-
         # build a string representation of the GameBoard
         representation = [
             "MarbleGame(",
             "_max_index= " + repr(self._max_index),
-            "_direction_to_step= " + repr(self._direction_to_step),
-            "_previous_state=[\n" + ",\n".join(previous_state_representation).replace("None", null_char) + "]",
-            "_grid=[\n" + ",\n".join(grid_representation).replace("None", null_char) + "]",
+            "_previous_state= " + repr(self._previous_state),
+            "_grid= " + repr(self._grid),
             ")"
         ]
         return '\n'.join(representation)
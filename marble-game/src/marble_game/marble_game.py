@@ -18,14 +18,32 @@
 # Description: Contains backend logic for the marble game and provides an interface for the game. Responsible for:
 #              turn tracking, score tracking, making (valid) moves and determining win conditions.
 #
+from __future__ import annotations
 import json
-from typing import Optional, Generator
-from .game_board import GameBoard, GameBoardEncoder, GameBoardDecoder
+import sys
+from typing import Final, Generator, Optional
+from .game_board import GameBoard, GameBoardDecoder
 
 
 class MarbleGame:
     """Represents a game instance, with two players and a board."""
 
+    # slots make instances smaller and their attributes faster to access, which the AI search does for every node
+    __slots__ = (
+        "_players", "_player_ids", "_player_colors", "_game_board", "_current_turn", "_winner", "_opponents",
+        "_move_history",
+    )
+
+    # class variables
+    _directions: Final = frozenset({'L', 'R', 'F', 'B'})
+    _player_keys: Final = frozenset({"color", "red_marbles_captured", "opponent_marbles_captured"})  # when restoring
+    _opposite_offsets: Final = {    # maps directions to the (row, column) offset of the square opposite the direction
+        'L': (0, 1),    # pushing left => square one column to the right should be empty or an edge
+        'R': (0, -1),   # pushing right => square one column to the left should be empty or an edge
+        'F': (1, 0),    # pushing up => square one row below should be empty or an edge
+        'B': (-1, 0),   # pushing down => square one row above should be empty or an edge
+    }
+
     def __init__(self,
                  player_one_data: tuple[str, str] = None,
                  player_two_data: tuple[str, str] = None,
@@ -48,35 +66,38 @@ class MarbleGame:
         """
         # get and validate player and board info
         if "players" in kwargs and "board" in kwargs:
-            player_ids = tuple(kwargs["players"].keys())
-            if len(player_ids) != 2:
+            players = kwargs["players"]
+            if len(players) != 2:
                 raise ValueError("kwarg players missing 1 or more player id")
 
-            required = {"color", "red_marbles_captured", "opponent_marbles_captured"}
-            if not all(required.issubset(kwargs["players"][player_id].keys()) for player_id in player_ids):
-                raise ValueError("kwarg players[player_id] missing required keys")
+            # validate each player's data and total up the captured marbles in a single pass
+            colors = set()
+            captured = 0
+            for player_data in players.values():
+                if not self._player_keys.issubset(player_data.keys()):
+                    raise ValueError("kwarg players[player_id] missing required keys")
+                colors.add(player_data["color"])
+                captured += player_data["red_marbles_captured"] + player_data["opponent_marbles_captured"]
 
-            valid_colors = {'B', 'W'}
-            valid_colors.discard(kwargs["players"][player_ids[0]]["color"])
-            valid_colors.discard(kwargs["players"][player_ids[1]]["color"])
-            if len(valid_colors) != 0:
+            if colors != {'B', 'W'}:
                 raise ValueError("players cannot have the same marble color and only 'B' and 'W' are valid colors")
 
-            captured = 0
-            for player_id in player_ids:
-                captured += kwargs["players"][player_id]["red_marbles_captured"]
-                captured += kwargs["players"][player_id]["opponent_marbles_captured"]
             if 29 - captured != sum(kwargs["board"].marble_count):  # there are 29 marbles originally on the board
                 raise ValueError("check board state or captured marble count")
 
-            # at this point, we can be fairly certain the data is valid
-            self._players = kwargs["players"]
+            # at this point, we can be fairly certain the data is valid; the player ids and keys are interned (restored
+            # strings are copies), so that the lookups made for every move can compare them by identity
+            self._players = {
+                sys.intern(player_id): {sys.intern(key): value for key, value in player_data.items()}
+                for player_id, player_data in players.items()
+            }
             self._game_board = kwargs["board"]
 
         elif player_one_data is not None and player_two_data is not None:
             # unpack the data; this will throw ValueError if there isn't enough data
             p1_id, p1_color = player_one_data
             p2_id, p2_color = player_two_data
+            p1_id, p2_id = sys.intern(p1_id), sys.intern(p2_id)     # interned, as when state is restored
 
             # validate the ids and colors
             if p1_id == p2_id:
@@ -106,8 +127,16 @@ class MarbleGame:
         else:
             raise TypeError("missing params - either pass required args or required kwargs")
 
-        self._current_turn = kwargs.get("current_turn")  # will hold the current player's id
-        self._winner = kwargs.get("winner")              # will hold the winning player's id
+        # the players never change, so their ids, colors and opponents can be looked up rather than computed
+        player_one_id, player_two_id = self._players
+        self._player_ids = frozenset(self._players)
+        self._player_colors = {player_id: player_data["color"] for player_id, player_data in self._players.items()}
+        self._opponents = {player_one_id: player_two_id, player_two_id: player_one_id}
+
+        current_turn, winner = kwargs.get("current_turn"), kwargs.get("winner")
+        self._current_turn = None if current_turn is None else sys.intern(current_turn)  # the current player's id
+        self._winner = None if winner is None else sys.intern(winner)                    # the winning player's id
+        self._move_history = []     # will hold the states needed to undo moves (see push_move)
 
     @property
     def current_turn(self) -> Optional[str]:
@@ -115,9 +144,9 @@ class MarbleGame:
         return self._current_turn
 
     @property
-    def player_ids(self) -> set[str]:
-        """A set containing the players' ids"""
-        return set(self._players.keys())
+    def player_ids(self) -> frozenset[str]:
+        """A frozenset containing the players' ids"""
+        return self._player_ids
 
     @property
     def winner(self) -> Optional[str]:
@@ -129,12 +158,18 @@ class MarbleGame:
         """The number of white, black and red marbles (in that order) present on the game board"""
         return self._game_board.marble_count
 
+    @property
+    def board_state(self) -> tuple[bytes, bytes]:
+        """A hashable snapshot of the board: its grid and its previous state (which the Ko rule depends on)"""
+        return self._game_board.save_state()
+
+    def get_opponent(self, player_id: str) -> Optional[str]:
+        """Returns the id of the specified player's opponent, or None if no such player exists"""
+        return self._opponents.get(player_id)
+
     def get_player_color(self, player_id: str) -> Optional[str]:
         """Returns the color of the specified player's marbles, or None if no such player exists"""
-        try:
-            return self._players[player_id]["color"]
-        except KeyError:
-            return None
+        return self._player_colors.get(player_id)
 
     def get_captured(self, player_id: str) -> Optional[int]:
         """Returns the number of red marbles captured by the specified player, or none if no such player exists"""
@@ -159,33 +194,39 @@ class MarbleGame:
         # we can just just call the game board's method for this
         return self._game_board.get_contents_at_position(coordinates)
 
-    def generate_possible_moves(self, player_id: str) -> Generator[tuple[tuple[int, int], str], None, None]:
-        """Generates all the possible moves that may be made by the specified player in the board's current state"""
+    def generate_possible_moves(
+            self, player_id: str, captures_first: bool = False
+    ) -> Generator[tuple[tuple[int, int], str], None, None]:
+        """
+        Generates all the possible moves that may be made by the specified player in the board's current state
+
+        :param player_id: the id of the player
+        :param captures_first: if True, moves that push a marble off the board are generated before all other moves
+        """
         player_color = self.get_player_color(player_id)
-        for coordinate in self._game_board.generate_all_row_and_column_combinations():
-            if self._game_board.get_contents_at_position(coordinate) == player_color:
-                # unpack the coordinates and check whether the adjacent squares are empty (or represent an edge)
-                row_index, column_index = coordinate
-
-                adjacent_squares = (               # adjacent squares, in order: above, below, left, right
-                    (row_index - 1, column_index),
-                    (row_index + 1, column_index),
-                    (row_index, column_index - 1),
-                    (row_index, column_index + 1)
-                )
-                directions = ('B', 'F', 'R', 'L')   # opposite moves, in order: backward, forward, right, left
-
-                for adjacent_coordinate, direction in zip(adjacent_squares, directions):
-                    # only valid coordinates are generated; if the square is now invalid, the original was on an edge
-                    square_along_edge = -1 in adjacent_coordinate or 7 in adjacent_coordinate
-                    if not square_along_edge and not self._game_board.is_empty_position(adjacent_coordinate):
-                        continue
-                    if self._game_board.simulate_move(coordinate, direction) not in {"previous", player_color}:
-                        yield coordinate, direction
+        deferred = []   # moves that don't push a marble off the board, if captures_first is True
+        game_board = self._game_board
+        for coordinate, direction in game_board.generate_pushable_marbles(player_color, skip_push_offs=True):
+            # the generated marbles exist, so the moves don't need to be validated before they're simulated
+            simulated_result = game_board._simulate_move(coordinate, direction)
+            if simulated_result == "previous":
+                continue
+            if captures_first and simulated_result is None:
+                deferred.append((coordinate, direction))
+            else:
+                yield coordinate, direction
+        yield from deferred
 
     def is_player_out_of_moves(self, player_id: str) -> bool:
         """Returns True if the specified player is out of possible moves, otherwise False."""
-        return next(self.generate_possible_moves(player_id), None) is None
+        # this only needs to find one move, so it checks the pushable marbles as in generate_possible_moves, but stops
+        # at the first legal move rather than going through another generator
+        player_color = self.get_player_color(player_id)
+        game_board = self._game_board
+        for coordinate, direction in game_board.generate_pushable_marbles(player_color, skip_push_offs=True):
+            if not game_board._violates_ko_rule(coordinate, direction):
+                return False
+        return True
 
     def is_move_valid(self, player_id: str, coordinates: tuple[int, int], direction: str) -> bool:
         """
@@ -199,44 +240,39 @@ class MarbleGame:
         :param coordinates: (row, column) coordinates of the cell
         :param direction: the direction to move the marble in the specified cell
         """
-        # validate game state and input
-        prerequisites = (
-            self.winner is None,                                # the game must not be over
-            player_id in self.player_ids,                       # the player must exist
-            direction in {'L', 'R', 'F', 'B'},                  # the direction must be valid
-            self._current_turn in {None, player_id},            # the player must be able to make a move
-            self._game_board.is_valid_square(coordinates),      # the square must exist
-        )
-        if not all(prerequisites):
+        # validate game state and input, stopping at the first check that fails
+        player = self._players.get(player_id)
+        current_turn = self._current_turn
+        if (
+            self._winner is not None                                        # the game must not be over
+            or player is None                                               # the player must exist
+            or direction not in self._directions                            # the direction must be valid
+            or (current_turn is not None and current_turn != player_id)     # the player must be able to make a move
+            or not self._game_board.is_valid_square(coordinates)            # the square must exist
+        ):
+            return False
+
+        # if the player is trying to move a marble that doesn't belong to them (or an empty square), the move is invalid
+        game_board = self._game_board   # queried directly, rather than through get_marble, since this is called a lot
+        player_marble_color = player["color"]
+        if player_marble_color != game_board.get_contents_at_position(coordinates):
             return False
 
         # check whether the square opposite the direction of movement is empty or an edge
-        row_index, column_index = coordinates
-        if direction == 'L':
-            column_index += 1  # pushing left => square one column to the right should be empty or an edge
-        elif direction == 'R':
-            column_index -= 1  # pushing right => square one column to the left should be empty or an edge
-        elif direction == 'F':
-            row_index += 1     # pushing up => square one row below should be empty or an edge
-        else:
-            row_index -= 1     # pushing down => square one row above should be empty or an edge
-        adjacent_coordinates = row_index, column_index
+        row_offset, column_offset = self._opposite_offsets[direction]
+        adjacent_coordinates = coordinates[0] + row_offset, coordinates[1] + column_offset
         # if the original square exists but the previous one doesn't, then the original square must occupy an edge
-        square_is_not_along_edge = self._game_board.is_valid_square(adjacent_coordinates)
-        if square_is_not_along_edge and self.get_marble(adjacent_coordinates) is not None:
+        square_is_not_along_edge = game_board.is_valid_square(adjacent_coordinates)
+        if square_is_not_along_edge and not game_board.is_empty_position(adjacent_coordinates):
             return False
 
-        # at this point, the game is still ongoing, it's the current player's turn, and the move is physically possible
-        # but we still need to check that the player is trying to move their own marble, won't push off one of their
-        # own marbles, and that the move won't return the board to its previous state
-
-        # if the player is trying to move a marble that doesn't belong to them, the move is invalid
-        player_marble_color = self.get_player_color(player_id)
-        if player_marble_color != self.get_marble(coordinates):
-            return False
+        # at this point, the game is still ongoing, it's the current player's turn, and the player is trying to move
+        # their own marble in a way that's physically possible, but we still need to check that the move won't push off
+        # one of their own marbles, or return the board to its previous state
 
-        # if pushing the marble would return the board to its previous state, the move is invalid
-        simulated_result = self._game_board.simulate_move(coordinates, direction)
+        # if pushing the marble would return the board to its previous state, the move is invalid; the square and
+        # direction have already been checked, so the move doesn't need to be validated again before it's simulated
+        simulated_result = game_board._simulate_move(coordinates, direction)
         if simulated_result == "previous":
             return False
 
@@ -266,20 +302,30 @@ class MarbleGame:
             return False
 
         # otherwise, make the move
-        marble_pushed_off = self._game_board.move_marble(coordinates, direction)
+        self._make_valid_move(player_id, coordinates, direction)
+        return True
 
-        # update the marble/score trackers
-        if marble_pushed_off is not None:
-            if marble_pushed_off == 'R':
-                self._players[player_id]["red_marbles_captured"] += 1
-            else:
-                self._players[player_id]["opponent_marbles_captured"] += 1
+    def _make_valid_move(self, player_id: str, coordinates: tuple[int, int], direction: str):
+        """
+        Helper method for make_move and push_move. Moves a marble in the specified cell and updates the game's state,
+        assuming the move has already been determined to be valid.
 
-        # check for win conditions (player captured 7 marbles, opponent has no marbles left)
-        if self.get_captured(player_id) >= 7:
-            # the player captured 7 red marbles, so they win
-            self._winner = player_id
-        else:
+        :param player_id: the id of the player making the move
+        :param coordinates: (row, column) coordinates of the cell
+        :param direction: the direction to move the marble in the specified cell
+        """
+        player = self._players[player_id]   # looked up once, since it's used for each of the updates below
+        marble_pushed_off = self._game_board.move_marble(coordinates, direction)
+
+        # update the marble/score trackers and check for win conditions (player captured 7 marbles, opponent has no
+        # marbles left); neither can change unless a marble was pushed off, so most moves skip both
+        if marble_pushed_off == 'R':
+            player["red_marbles_captured"] += 1
+            if player["red_marbles_captured"] >= 7:
+                # the player captured 7 red marbles, so they win
+                self._winner = player_id
+        elif marble_pushed_off is not None:
+            player["opponent_marbles_captured"] += 1
             white_marbles, black_marbles, red_marbles = self.marble_count
             if white_marbles == 0 or black_marbles == 0:
                 # a player can't push their own marbles off the board, so if either of these is 0 it's guaranteed
@@ -287,9 +333,7 @@ class MarbleGame:
                 self._winner = player_id
 
         # get the opponent's id
-        ids = self.player_ids
-        ids.remove(player_id)
-        opponent = ids.pop()  # there should only be one element in the set so we can just use pop()
+        opponent = self._opponents[player_id]
 
         # swap the current player
         self._current_turn = opponent
@@ -298,9 +342,76 @@ class MarbleGame:
         if self.is_player_out_of_moves(opponent):
             self._winner = player_id
 
-        # if we get here, then the move was valid
+    def push_move(self, player_id: str, coordinates: tuple[int, int], direction: str, validate: bool = True) -> bool:
+        """
+        Attempts to move a marble in the specified cell, as in make_move. If the move is made, it's recorded so that
+        it can be undone by pop_move; this is cheaper than copying the game to try out a move.
+
+        :param player_id: the id of the player making the move
+        :param coordinates: (row, column) coordinates of the cell
+        :param direction: the direction to move the marble in the specified cell
+        :param validate: if False, the move is assumed to be valid and isn't checked; only pass False for moves that
+                         generate_possible_moves produced for the current player in the current state
+        :return: True if the move was made, otherwise False (in which case nothing is recorded)
+        """
+        if validate and not self.is_move_valid(player_id, coordinates, direction):
+            return False
+
+        # save only what a move can change: the board, the player's captured marbles, the current turn and the winner
+        player = self._players[player_id]
+        board_state = self._game_board.save_state()
+        red_captured, opponent_captured = player["red_marbles_captured"], player["opponent_marbles_captured"]
+        current_turn, winner = self._current_turn, self._winner
+
+        self._make_valid_move(player_id, coordinates, direction)
+        self._move_history.append(
+            (board_state, player_id, red_captured, opponent_captured, current_turn, winner)
+        )
         return True
 
+    def pop_move(self):
+        """
+        Undoes the last move made by push_move, restoring the game to the state it was in before the move.
+
+        :raises IndexError: if there are no moves to undo
+        """
+        board_state, player_id, red_captured, opponent_captured, current_turn, winner = self._move_history.pop()
+        self._game_board.restore_state(board_state)
+        player = self._players[player_id]
+        player["red_marbles_captured"] = red_captured
+        player["opponent_marbles_captured"] = opponent_captured
+        self._current_turn = current_turn
+        self._winner = winner
+
+    def to_dict(self) -> dict:
+        """
+        Returns a representation of the game's state composed only of built-in types (suitable for serialization), in
+        the form expected by from_dict.
+        """
+        return {
+            "board": {
+                "grid": self._game_board.grid_as_str,
+                "previous_state": self._game_board.previous_grid_as_str,
+            },
+            "players": {player_id: dict(player_data) for player_id, player_data in self._players.items()},
+            "current_turn": self._current_turn,
+            "winner": self._winner,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> MarbleGame:
+        """
+        Restores a MarbleGame from the representation returned by to_dict.
+
+        :param d: a dict containing board (with grid and previous_state), players, current_turn and winner
+        """
+        return cls(
+            board=GameBoard(grid=d["board"]["grid"], previous_state=d["board"]["previous_state"]),
+            players=d["players"],
+            current_turn=d["current_turn"],
+            winner=d["winner"],
+        )
+
     def __str__(self):
         return str(self._game_board)
 
@@ -316,29 +427,38 @@ class MarbleGame:
         return '\n'.join(representation)
 
 
+# the board's decoder is stateless, so it's created once rather than by every json.loads call
+_game_board_decoder = GameBoardDecoder()
+
+
 class MarbleGameEncoder(json.JSONEncoder):
     """Encodes the relevant MarbleGame info to JSON str"""
 
     def default(self, o: MarbleGame) -> dict:
         if not isinstance(o, MarbleGame):
             raise TypeError(f"Unsupported type {o.__class__}")
-        return {
-            "board": json.dumps(o._game_board, cls=GameBoardEncoder),
-            "players": json.dumps(o._players),
-            "current_turn": o.current_turn,
-            "winner": o.winner,
-        }
+        # the board and players are nested objects, so the whole game is encoded in a single pass
+        return o.to_dict()
 
 
 class MarbleGameDecoder(json.JSONDecoder):
     """Decodes JSON GameBoard str to a MarbleGame object"""
 
     def __init__(self):
-        # define a hook
+        # define a hook; it's called for every JSON object, innermost first, so the board and player objects are
+        # passed through and only the outermost object is turned into a MarbleGame
         def hook(d: dict):
+            if not {"board", "players", "current_turn", "winner"}.issubset(d.keys()):
+                return d
+            # games encoded by earlier versions store the board and players as JSON-encoded strings
+            board = d["board"]
+            players = d["players"]
             return MarbleGame(
-                board=json.loads(d["board"], cls=GameBoardDecoder),
-                players=json.loads(d["players"]),
+                board=(
+                    _game_board_decoder.decode(board) if isinstance(board, str)
+                    else GameBoard(grid=board["grid"], previous_state=board["previous_state"])
+                ),
+                players=json.loads(players) if isinstance(players, str) else players,
                 current_turn=d["current_turn"],
                 winner=d["winner"],
             )
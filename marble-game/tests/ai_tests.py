@@ -0,0 +1,77 @@
+# Modified:    2021-09-09
+# Description: Contains unit tests for the AI
+import unittest
+from marble_game import MarbleGame, make_move_ai
+from marble_game.ai import heuristic
+
+
+class HeuristicTester(unittest.TestCase):
+    """Contains unit tests for the AI's heuristic"""
+
+    def setUp(self):
+        """Create a MarbleGame to be used in tests"""
+        self._player_b = "Player B ID"
+        self._player_w = "Player W ID"
+        self._test_game = MarbleGame((self._player_b, 'B'), (self._player_w, 'W'))
+
+    def test_heuristic_counts_captured_marbles(self):
+        """Tests whether the heuristic is the difference between the players' captured marbles"""
+        self.assertEqual(heuristic(self._player_w, self._player_b, self._test_game), 0)
+
+        # make moves until player w pushes off a black marble
+        for move in ((self._player_w, (1, 0), 'R'), (self._player_b, (1, 6), 'L'), (self._player_w, (1, 1), 'R'),
+                     (self._player_b, (0, 6), 'B'), (self._player_w, (1, 2), 'R')):
+            self.assertTrue(self._test_game.make_move(*move))
+
+        self.assertEqual(heuristic(self._player_w, self._player_b, self._test_game), 1)
+        self.assertEqual(heuristic(self._player_b, self._player_w, self._test_game), -1)
+
+    def test_heuristic_pads_winner(self):
+        """Tests whether the heuristic favors a game the maximizer has won, and disfavors one the minimizer has won"""
+        game = MarbleGame(
+            board=self._test_game._game_board,
+            players={
+                self._player_b: {"color": 'B', "red_marbles_captured": 0, "opponent_marbles_captured": 0},
+                self._player_w: {"color": 'W', "red_marbles_captured": 0, "opponent_marbles_captured": 0},
+            },
+            winner=self._player_w,
+        )
+        self.assertEqual(heuristic(self._player_w, self._player_b, game), 100)
+        self.assertEqual(heuristic(self._player_b, self._player_w, game), -100)
+
+
+class MakeMoveAITester(unittest.TestCase):
+    """Contains unit tests for make_move_ai"""
+
+    def setUp(self):
+        """Create a MarbleGame to be used in tests"""
+        self._player = "Player ID"
+        self._ai = "AI ID"
+        self._test_game = MarbleGame((self._player, 'W'), (self._ai, 'B'))
+
+    def test_make_move_ai(self):
+        """Tests whether the AI makes a valid move on its turn, and only on its turn"""
+        self.assertTrue(self._test_game.make_move(self._player, (0, 0), 'B'))
+        state_before_move = self._test_game.to_dict()
+
+        self.assertTrue(make_move_ai(self._ai, self._test_game))
+        self.assertEqual(self._test_game.current_turn, self._player)
+        self.assertNotEqual(self._test_game.to_dict()["board"], state_before_move["board"])
+
+        # it's no longer the AI's turn, so it shouldn't be able to move
+        self.assertFalse(make_move_ai(self._ai, self._test_game))
+
+    def test_make_move_ai_opening(self):
+        """Tests whether the AI makes the same move when it meets an opening it has already searched"""
+        self.assertTrue(self._test_game.make_move(self._player, (0, 0), 'B'))
+        other_game = MarbleGame(("Other Player ID", 'W'), ("Other AI ID", 'B'))
+        self.assertTrue(other_game.make_move("Other Player ID", (0, 0), 'B'))
+
+        self.assertTrue(make_move_ai(self._ai, self._test_game))
+        self.assertTrue(make_move_ai("Other AI ID", other_game))
+        self.assertEqual(self._test_game.to_dict()["board"], other_game.to_dict()["board"])
+        self.assertEqual(other_game.current_turn, "Other Player ID")
+
+
+if __name__ == '__main__':
+    unittest.main()
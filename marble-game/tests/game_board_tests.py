@@ -1,39 +1,7 @@
 # Modified:    2021-08-16
-# Description: Contains unit tests for GameBoard & Square
+# Description: Contains unit tests for GameBoard
 import unittest
-from marble_game.game_board import Square, GameBoard, IllegalMoveException
-
-
-class SquareTester(unittest.TestCase):
-    """
-    Contains unittests for the Square class
-    """
-
-    def test_create_square(self):
-        """
-        Tests whether Squares are created as expected
-        """
-        empty_square = Square()
-        square = Square('R')
-
-        # the empty square shouldn't contain anything, but the other should contain 'R'
-        self.assertIsNone(empty_square.contents)
-        self.assertEqual(square.contents, 'R')
-
-    def test_set_square_contents(self):
-        """
-        Tests whether Squares can have their contents changed as expected
-        """
-        empty_square = Square()
-        square = Square('R')
-
-        # tests whether we can set new values for the empty square
-        empty_square.contents = 'W'
-        self.assertEqual(empty_square.contents, 'W')
-
-        # tests whether we can set new values for the non-empty square
-        square.contents = 'B'
-        self.assertEqual(square.contents, 'B')
+from marble_game.game_board import GameBoard, IllegalMoveException
 
 
 class GameBoardTester(unittest.TestCase):
@@ -109,6 +77,10 @@ class GameBoardTester(unittest.TestCase):
         # check for something in the middle
         self.assertTrue(self._board.is_valid_square((4, 5)))
 
+        # coordinates may also be passed as a list
+        self.assertTrue(self._board.is_valid_square([4, 5]))
+        self.assertFalse(self._board.is_valid_square([7, 0]))
+
     def test_is_empty_position(self):
         """
         Tests whether is_empty_position works correctly
@@ -123,20 +95,20 @@ class GameBoardTester(unittest.TestCase):
         """
         Tests whether _deepcopy_grid correctly returns a deepcopy and not a shallow copy
         """
-        # make two deep copies - if the grids contain identical copies, then the copies were shallow
+        # make two deep copies - if the grids are the same object, then the copies were shallow
         grid_1 = self._board._deepcopy_grid()
         grid_2 = self._board._deepcopy_grid()
 
         self.assertIsNot(grid_1, grid_2)
-        for coordinates in self._board.generate_all_row_and_column_combinations():
-            # get the squares at the same position in each grid copy
-            row_index, column_index = coordinates
-            square_1 = grid_1[row_index][column_index]
-            square_2 = grid_2[row_index][column_index]
-            # contents of the squares should be the same
-            self.assertEqual(square_1.contents, square_2.contents)
-            # but they should be totally different objects
-            self.assertIsNot(square_1, square_2)
+        self.assertIsNot(grid_1, self._board._grid)
+        # contents of the grids should be the same
+        self.assertEqual(grid_1, grid_2)
+        self.assertEqual(self._board.grid_as_str, grid_1.decode())
+
+        # but changing one copy shouldn't affect the other or the board
+        grid_1[0] = ord(' ')
+        self.assertEqual(grid_2[0], ord('W'))
+        self.assertEqual(self._board.get_contents_at_position((0, 0)), 'W')
 
     # noinspection DuplicatedCode
     def test_illegal_move_exception_raised(self):
@@ -455,6 +427,45 @@ class GameBoardTester(unittest.TestCase):
         # now simulate trying to move it back up
         self.assertEqual(self._board.simulate_move((2, 1), 'F'), "previous")
 
+    def test_violates_ko_rule(self):
+        """Test whether moves that would return the board to its previous state (and only those) violate the Ko rule"""
+        self._board.move_marble((1, 1), 'B')  # after this, the marble is at 2, 1
+        self.assertTrue(self._board._violates_ko_rule((2, 1), 'F'))
+
+        # the marble at 2, 1 was empty in the previous state, but pushing it in other directions doesn't recreate it
+        self.assertFalse(self._board._violates_ko_rule((2, 1), 'R'))
+        # the other marbles' squares weren't empty in the previous state, so they can't recreate it
+        self.assertFalse(self._board._violates_ko_rule((0, 1), 'F'))
+
+    def test_generate_pushable_marbles(self):
+        """
+        Tests whether GameBoard.generate_pushable_marbles generates each marble whose square opposite the direction
+        of movement is empty (or an edge), in order
+        """
+        # every white marble is in a corner region, so each one can be pushed in exactly two directions
+        expected = [
+            ((0, 0), 'B'), ((0, 0), 'R'), ((0, 1), 'B'), ((0, 1), 'L'),
+            ((1, 0), 'F'), ((1, 0), 'R'), ((1, 1), 'F'), ((1, 1), 'L'),
+            ((5, 5), 'B'), ((5, 5), 'R'), ((5, 6), 'B'), ((5, 6), 'L'),
+            ((6, 5), 'F'), ((6, 5), 'R'), ((6, 6), 'F'), ((6, 6), 'L'),
+        ]
+        self.assertListEqual(list(self._board.generate_pushable_marbles('W')), expected)
+
+        # after moving the white marble at 1, 1 down, the marbles around it can be pushed in different directions
+        self._board.move_marble((1, 1), 'B')
+        pushable = list(self._board.generate_pushable_marbles('W'))
+        self.assertIn(((0, 1), 'F'), pushable)
+        self.assertIn(((1, 0), 'L'), pushable)
+        self.assertIn(((2, 1), 'B'), pushable)
+        self.assertNotIn(((2, 1), 'F'), pushable)
+
+        # pushing the white marble at 0, 1 left or the one at 1, 0 forward would push off the white marble at 0, 0
+        pushable = list(self._board.generate_pushable_marbles('W', skip_push_offs=True))
+        self.assertNotIn(((0, 1), 'L'), pushable)
+        self.assertNotIn(((1, 0), 'F'), pushable)
+        self.assertIn(((0, 0), 'R'), pushable)
+        self.assertIn(((2, 1), 'B'), pushable)
+
 
 if __name__ == '__main__':
     unittest.main()
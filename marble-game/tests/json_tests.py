@@ -55,7 +55,7 @@ class GameBoardJSONTests(unittest.TestCase):
         """Tests whether GameBoard can be encoded then decoded to the same state"""
         encoded_json = json.dumps(self._board, cls=GameBoardEncoder)
         decoded_board = json.loads(encoded_json, cls=GameBoardDecoder)
-        for var in vars(self._board):
+        for var in GameBoard.__slots__:
             self.assertEqual(getattr(self._board, var), getattr(decoded_board, var))
 
 
@@ -69,11 +69,11 @@ class MarbleGameJSONTests(unittest.TestCase):
         self._test_game = MarbleGame((self._player_b, 'B'), (self._player_w, 'W'))
         self.json_string_init = json.dumps(
             {
-                "board": json.dumps({
+                "board": {
                     "grid": "WW   BBWW R BB  RRR   RRRRR   RRR  BB R WWBB   WW",
                     "previous_state": " " * 49,
-                }),
-                "players": json.dumps({
+                },
+                "players": {
                     "Player B ID": {
                             "color": 'B',
                             "red_marbles_captured": 0,
@@ -86,7 +86,6 @@ class MarbleGameJSONTests(unittest.TestCase):
                             "opponent_marbles_captured": 0,
                         },
                 },
-                ),
                 "current_turn": None,
                 "winner": None,
             },
@@ -94,11 +93,11 @@ class MarbleGameJSONTests(unittest.TestCase):
         )
         self.json_string_mid = json.dumps(
             {
-                "board": json.dumps({
+                "board": {
                     "grid":           " W   BBWW R BBW RRR   RRRRR   RRR  BB R WWBB   WW",
                     "previous_state": "WW   BBWW R BB  RRR   RRRRR   RRR  BB R WWBB   WW",
-                }),
-                "players": json.dumps({
+                },
+                "players": {
                     "Player B ID": {
                             "color": 'B',
                             "red_marbles_captured": 0,
@@ -111,7 +110,6 @@ class MarbleGameJSONTests(unittest.TestCase):
                             "opponent_marbles_captured": 0,
                         },
                 },
-                ),
                 "current_turn": "Player B ID",
                 "winner": None,
             },
@@ -159,20 +157,56 @@ class MarbleGameJSONTests(unittest.TestCase):
         self.assertEqual("Player B ID", game.current_turn)
         self.assertIsNone(game.winner)
 
+    def test_decode_json_encoded_board_and_players(self):
+        """Tests whether MarbleGame is decoded as expected when its board and players are JSON-encoded strings"""
+        # games encoded by earlier versions nest the board and players as JSON strings
+        game_dict = json.loads(self.json_string_mid)
+        game_dict["board"] = json.dumps(game_dict["board"])
+        game_dict["players"] = json.dumps(game_dict["players"])
+        game = json.loads(json.dumps(game_dict), cls=MarbleGameDecoder)
+
+        # the game should be decoded to the same state as the current format
+        expected = json.loads(self.json_string_mid, cls=MarbleGameDecoder)
+        self.assertIsInstance(game, MarbleGame)
+        self.assertDictEqual(expected.to_dict(), game.to_dict())
+
     def test_encode_then_decode(self):
         """Tests whether MarbleGame can be encoded then decoded to the same state"""
         encoded_json = json.dumps(self._test_game, cls=MarbleGameEncoder)
         decoded_game = json.loads(encoded_json, cls=MarbleGameDecoder)
-        for var in vars(self._test_game):
+        for var in MarbleGame.__slots__:
             if var == "_game_board":
                 # GameBoard doesn't have __eq__ defined, so we need to compare its properties individually
                 original_board = self._test_game._game_board
                 decoded_board = decoded_game._game_board
-                for board_var in vars(self._test_game._game_board):
+                for board_var in GameBoard.__slots__:
                     self.assertEqual(getattr(original_board, board_var), getattr(decoded_board, board_var))
             else:
                 self.assertEqual(getattr(self._test_game, var), getattr(decoded_game, var))
 
+    def test_to_dict_then_from_dict(self):
+        """Tests whether MarbleGame can be converted to a dict then restored to the same state"""
+        self._test_game.make_move("Player W ID", (0, 0), 'B')
+        game_dict = self._test_game.to_dict()
+        self.assertEqual(" W   BBWW R BBW RRR   RRRRR   RRR  BB R WWBB   WW", game_dict["board"]["grid"])
+        self.assertEqual("WW   BBWW R BB  RRR   RRRRR   RRR  BB R WWBB   WW", game_dict["board"]["previous_state"])
+
+        # the dict must be a copy, not a view of the game's state
+        game_dict["players"]["Player W ID"]["red_marbles_captured"] = 5
+        self.assertEqual(0, self._test_game.get_captured("Player W ID"))
+        game_dict["players"]["Player W ID"]["red_marbles_captured"] = 0
+
+        restored_game = MarbleGame.from_dict(game_dict)
+        self.assertIsInstance(restored_game, MarbleGame)
+        self.assertEqual(self._test_game._game_board.grid_as_str, restored_game._game_board.grid_as_str)
+        self.assertEqual(
+            self._test_game._game_board.previous_grid_as_str,
+            restored_game._game_board.previous_grid_as_str,
+        )
+        self.assertDictEqual(self._test_game._players, restored_game._players)
+        self.assertEqual(self._test_game.current_turn, restored_game.current_turn)
+        self.assertEqual(self._test_game.winner, restored_game.winner)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -94,6 +94,14 @@ class GameTester(unittest.TestCase):
         self.assertTrue(game_2.make_move(self._player_w, (0, 0), 'B'))
         self.assertTrue(game_1.make_move(self._player_b, (0, 5), 'B'))
 
+    def test_get_opponent(self):
+        """
+        Tests whether get_opponent returns each player's opponent, or None for an unknown player
+        """
+        self.assertEqual(self._test_game.get_opponent(self._player_b), self._player_w)
+        self.assertEqual(self._test_game.get_opponent(self._player_w), self._player_b)
+        self.assertIsNone(self._test_game.get_opponent("Player X ID"))
+
     def test_get_captured(self):
         """
         Tests whether get_captured correctly returns 0 when no red marbles have been captured
@@ -154,6 +162,22 @@ class GameTester(unittest.TestCase):
             # re-raise to preserve the original behavior of the tests on failure
             raise error
 
+    def test_generate_possible_moves_captures_first(self):
+        """
+        Tests whether generate_possible_moves generates the same moves when captures_first is True, but with the moves
+        that push a marble off the board first
+        """
+        # make moves until player w can push off a black marble by pushing the marble at (1, 2) right
+        for move in ((self._player_w, (1, 0), 'R'), (self._player_b, (1, 6), 'L'), (self._player_w, (1, 1), 'R'),
+                     (self._player_b, (0, 6), 'B')):
+            self.assertTrue(self._test_game.make_move(*move))
+
+        moves = list(self._test_game.generate_possible_moves(self._player_w))
+        ordered_moves = list(self._test_game.generate_possible_moves(self._player_w, captures_first=True))
+        self.assertCountEqual(moves, ordered_moves)
+        self.assertNotEqual(moves[0], ((1, 2), 'R'))
+        self.assertEqual(ordered_moves[0], ((1, 2), 'R'))
+
     def test_is_move_valid_on_invalid_input(self):
         """
         Tests whether is_move_valid correctly returns False when passed a player, direction or coordinates
@@ -188,6 +212,16 @@ class GameTester(unittest.TestCase):
         """
         self.assertFalse(self._test_game.is_move_valid(self._player_b, (0, 3), 'R'))
 
+    def test_is_move_valid_on_list_coordinates(self):
+        """
+        Tests whether is_move_valid and make_move accept coordinates passed as a list (e.g. when decoded from JSON)
+        """
+        self.assertTrue(self._test_game.is_move_valid(self._player_b, [0, 5], 'B'))
+        self.assertFalse(self._test_game.is_move_valid(self._player_b, [1, 7], 'R'))
+        self.assertFalse(self._test_game.is_move_valid(self._player_b, [0, 3], 'R'))
+        self.assertTrue(self._test_game.make_move(self._player_b, [0, 5], 'B'))
+        self.assertEqual(self._test_game.get_marble((1, 5)), 'B')
+
     def test_is_move_valid_on_marble_color(self):
         """
         Tests whether is_move_valid returns the correct value depending on the color of the marble located
@@ -615,6 +649,39 @@ class GameTester(unittest.TestCase):
             # re-raise to preserve the original behavior of the tests on failure
             raise error
 
+    def test_push_move_then_pop_move(self):
+        """
+        Tests whether moves made by push_move are undone by pop_move, restoring the game to its original state, and
+        whether invalid moves are not recorded
+        """
+        original_state = self._test_game.to_dict()
+
+        # an invalid move shouldn't be recorded, so there should be nothing to undo
+        self.assertFalse(self._test_game.push_move(self._player_b, (0, 0), 'R'))
+        self.assertRaises(IndexError, self._test_game.pop_move)
+
+        # make moves until player w pushes off a black marble, then undo the last move
+        moves = (
+            (self._player_w, (1, 0), 'R'), (self._player_b, (1, 6), 'L'), (self._player_w, (1, 1), 'R'),
+            (self._player_b, (0, 6), 'B'), (self._player_w, (1, 2), 'R'),
+        )
+        for move in moves:
+            self.assertTrue(self._test_game.push_move(*move))
+        self.assertTupleEqual(self._test_game.marble_count, (8, 7, 13))
+        self.assertEqual(self._test_game.get_opponent_captured(self._player_w), 1)
+        self.assertEqual(self._test_game.current_turn, self._player_b)
+
+        self._test_game.pop_move()
+        self.assertTupleEqual(self._test_game.marble_count, (8, 8, 13))
+        self.assertEqual(self._test_game.get_opponent_captured(self._player_w), 0)
+        self.assertEqual(self._test_game.current_turn, self._player_w)
+
+        # undo the remaining moves
+        for _ in range(len(moves) - 1):
+            self._test_game.pop_move()
+        self.assertDictEqual(original_state, self._test_game.to_dict())
+        self.assertRaises(IndexError, self._test_game.pop_move)
+
 
 if __name__ == '__main__':
     unittest.main()